@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.8 on 2026-10-18 02:15
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('freemoney', '0006_essay_data'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='application',
+            index_together=set([('applicant', 'due_at')]),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.8 on 2026-10-18 02:20
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def set_section_flags(apps, schema_editor_):
+    Award = apps.get_model('freemoney', 'Award')
+    Award.objects.filter(identifier__in=['ean_hong',
+                                         'ambassador',
+                                         'giff_albright',
+                                         'joe_conway',
+                                         'navy_marine']
+    ).update(needs_finaid=True)
+    Award.objects.filter(identifier__in=['ean_hong',
+                                         'ambassador',
+                                         'giff_albright']
+    ).update(needs_essay=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('freemoney', '0007_application_applicant_due_at_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='award',
+            name='needs_essay',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='award',
+            name='needs_finaid',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(set_section_flags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.8 on 2026-10-18 02:27
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('freemoney', '0008_award_section_flags'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='application',
+            name='data_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='application',
+            name='validation_cache',
+            field=models.TextField(blank=True),
+        ),
+    ]
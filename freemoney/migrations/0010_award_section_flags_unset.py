@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.8 on 2026-10-18 02:55
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('freemoney', '0009_application_validation_cache'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='award',
+            name='needs_essay',
+            field=models.BooleanField(default=None),
+        ),
+        migrations.AlterField(
+            model_name='award',
+            name='needs_finaid',
+            field=models.BooleanField(default=None),
+        ),
+    ]
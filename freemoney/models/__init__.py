@@ -1,8 +1,15 @@
-from .validation  import (CustomValidationIssue,
+from .validation  import (CustomValidationContext,
+                          CustomValidationIssue,
                           CustomValidationIssueSet)
 from .semester    import (Semester, SemesterField)
+from .versioned   import  VersionedManager
 from .application import  Application
 from .award       import  Award
 from .essay       import (Essay, EssayPrompt)
 from .finaid      import  FinancialAid
 from .profile     import  ApplicantProfile
+from .catalog     import (Catalog,
+                          CatalogVersion,
+                          get_catalog,
+                          invalidate_catalog)
+from .cycle       import (Cycle, get_current_cycle)
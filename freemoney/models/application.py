@@ -1,16 +1,23 @@
+import contextlib
 import datetime
-from django.core.exceptions import ValidationError
+from functools import partial
+from django.core.exceptions import FieldDoesNotExist, ValidationError
 from django.core.validators import EmailValidator
 from django.conf import settings
 from django.db.models import (Model,
+                              Manager,
+                              Prefetch,
                               CASCADE,
                               BooleanField,
                               DateTimeField,
+                              F,
                               FloatField,
                               ForeignKey,
+                              PositiveIntegerField,
                               TextField)
 import freemoney.models
-from freemoney.models import (CustomValidationIssue,
+from freemoney.models import (CustomValidationContext,
+                              CustomValidationIssue,
                               CustomValidationIssueSet,
                               Semester,
                               SemesterField)
@@ -18,6 +25,27 @@ from phonenumber_field import phonenumber
 import re
 
 
+class ApplicationManager(Manager):
+    """Manager class for the Application model (see below)"""
+
+    def prefetched(self):
+        """QuerySet of Applications with all of their related records loaded
+
+        The awards, essays (with their prompts), and financial aid records of
+        every Application are fetched in one extra query apiece. Afterwards,
+        e.g., application.award_set.all() is answered without any query.
+        """
+
+        return self.prefetch_related(*[
+                Application._related_lookup(section)
+                for section in Application.RELATED_RECORDS
+        ])
+
+    def bump_data_version(self, pks):
+        """Increment the data_version of the Applications with these pks"""
+        self.filter(pk__in=pks).update(data_version=F('data_version') + 1)
+
+
 class Application(Model):
     """An applicant's entire response."""
 
@@ -37,6 +65,221 @@ class Application(Model):
     in_state_tuition = BooleanField(default=False)
     additional_remarks = TextField(blank=True)
     submitted = BooleanField(default=False)
+    # see cached_issues and store_issues
+    data_version = PositiveIntegerField(default=0)
+    validation_cache = TextField(blank=True)
+
+    objects = ApplicationManager()
+
+    # True within deferring_data_version (see below)
+    data_version_deferred = False
+
+    class Meta:
+        # ApplicantProfile.current_application looks up by a due_at range
+        index_together = [('applicant', 'due_at')]
+
+    # Sections validated by custom_validate (see below), in order
+    VALIDATION_SECTIONS = ['basicinfo', 'award', 'essay', 'finaid']
+
+    # Sections which must be re-validated after a change to the data of a
+    # section or (where it matters to another section) an Application field;
+    # a change to any other Application field affects only basicinfo
+    VALIDATION_DEPENDENCIES = {
+            'basicinfo': {'basicinfo', 'award', 'essay'},
+            'award': {'award', 'essay'},
+            'essay': {'essay'},
+            'finaid': {'finaid'},
+            'due_at': {'basicinfo', 'award', 'essay'},
+            'major': {'basicinfo', 'award'},
+            'emch_minor': {'basicinfo', 'award'},
+            'semester_graduating': {'basicinfo', 'award'},
+            'semester_initiated': {'basicinfo', 'essay'},
+    }
+
+    # Related records read during validation, by section: the accessor, and
+    # the name under which Django caches the prefetched records
+    RELATED_RECORDS = {
+            'award': ('award_set', 'award'),
+            'essay': ('essay_set', 'essay'),
+            'finaid': ('financialaid_set', 'financialaid'),
+    }
+
+    @classmethod
+    def _related_lookup(cls, section):
+        accessor, cache_name_ = cls.RELATED_RECORDS[section]
+        if section == 'essay':
+            essays = freemoney.models.Essay.objects.select_related('prompt')
+            return Prefetch(accessor, queryset=essays)
+        else:
+            return accessor
+
+    def related_records(self, section):
+        """List the related records for a section, preferably prefetched ones
+
+        If the records were not prefetched, they are queried afresh (in the
+        same way as ApplicationManager.prefetched would), but not cached.
+        """
+
+        accessor, cache_name = self.RELATED_RECORDS[section]
+        cache = getattr(self, '_prefetched_objects_cache', {})
+        if cache_name in cache:
+            return list(getattr(self, accessor).all())
+        else:
+            lookup = self._related_lookup(section)
+            if isinstance(lookup, Prefetch):
+                return list(lookup.queryset.filter(application=self))
+            else:
+                return list(getattr(self, accessor).all())
+
+    def forget_related_records(self, *sections):
+        """Discard prefetched related records for sections (default: all)"""
+
+        if len(sections) == 0:
+            sections = self.RELATED_RECORDS.keys()
+        cache = getattr(self, '_prefetched_objects_cache', {})
+        for section in sections:
+            accessor_, cache_name = self.RELATED_RECORDS[section]
+            cache.pop(cache_name, None)
+
+    @classmethod
+    def sections_affected_by(cls, changes):
+        """Return the set of sections affected by changes to sections/fields
+
+        Each change is the name of a section (e.g., 'finaid' when financial
+        aid records are added or removed) or of an Application field (e.g.,
+        'major'). The result is suitable for the sections argument of
+        custom_validate.
+        """
+
+        affected = set()
+        for change in changes:
+            if change in cls.VALIDATION_DEPENDENCIES:
+                affected.update(cls.VALIDATION_DEPENDENCIES[change])
+            else:
+                try:
+                    cls._meta.get_field(change)
+                except FieldDoesNotExist:
+                    raise KeyError('unknown section or field: {}'.format(
+                            change
+                    ))
+                affected.add('basicinfo')
+        return affected
+
+    def _validation_cache_stamp(self, context, data_version):
+        # besides the Application's own data, the issues depend on the Award
+        # and EssayPrompt definitions and on the current application cycle
+        return '{}:{}:{}'.format(
+                data_version,
+                context.catalog.stamp,
+                freemoney.models.get_current_cycle().due_at.isoformat()
+        )
+
+    def _forget_data_version(self):
+        # (Django reloads a field missing from __dict__ when it is next read)
+        self.__dict__.pop('data_version', None)
+
+    def bump_data_version(self):
+        """Increment data_version (see cached_issues), to be reloaded later"""
+
+        Application.objects.bump_data_version([self.pk])
+        self._forget_data_version()
+
+    @classmethod
+    def bump_data_version_of(cls, record):
+        """Increment data_version for the Application of a related record
+
+        If the record holds its Application instance (e.g., the one being
+        edited by a wizard page), that instance is reloaded as well, unless
+        it is deferring its data_version.
+        """
+
+        cache_name = type(record)._meta.get_field(
+                'application'
+        ).get_cache_name()
+        application = getattr(record, cache_name, None)
+        if application is None:
+            cls.objects.bump_data_version([record.application_id])
+        elif not application.data_version_deferred:
+            application.bump_data_version()
+
+    @contextlib.contextmanager
+    def deferring_data_version(self):
+        """Make a batch of changes without incrementing data_version
+
+        Meanwhile, saving this instance, changing its award selection, or
+        saving or deleting a record which holds this instance, leaves
+        data_version alone. Afterwards, the caller increments it just once
+        (e.g., with store_issues(data_changed=True)).
+        """
+
+        self.data_version_deferred = True
+        try:
+            yield self
+        finally:
+            self.data_version_deferred = False
+
+    def save(self, *args, **kwargs):
+        """Save the Application, incrementing its data_version"""
+
+        if self._state.adding or self.data_version_deferred:
+            return super(Application, self).save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = list(update_fields) + ['data_version']
+        data_version = self.data_version
+        self.data_version = F('data_version') + 1
+        try:
+            super(Application, self).save(*args, **kwargs)
+        except Exception:
+            self.data_version = data_version
+            raise
+        self._forget_data_version()
+
+    def cached_issues(self, context):
+        """Return the issues saved by store_issues, or None if outdated
+
+        The issues are outdated once data_version has been incremented. This
+        happens whenever the Application is saved, whenever an Essay or a
+        FinancialAid is saved or deleted (but not deleted in bulk, from a
+        QuerySet), whenever the award selection is changed, and whenever
+        store_issues is told that the data changed (see also
+        deferring_data_version).
+        """
+
+        stamp, separator_, serialized = self.validation_cache.partition('\n')
+        if stamp != self._validation_cache_stamp(context, self.data_version):
+            return None
+        try:
+            return CustomValidationIssueSet.from_json(serialized)
+        except ValueError:
+            # stored in some earlier format (or corrupted)
+            return None
+
+    def store_issues(self, issues, context, data_changed=False):
+        """Save the result of custom_validate, for later use by cached_issues
+
+        Pass data_changed=True after saving any changes to the Application
+        or its related records (including those made in bulk, e.g. by
+        bulk_create), so that data_version is incremented and reloaded
+        first; issues should then be computed with the Application's row
+        locked. Otherwise, issues are only stored if data_version has not
+        been changed meanwhile (e.g., by a concurrent request), so outdated
+        issues never overwrite new ones.
+        """
+
+        if data_changed:
+            self.bump_data_version()
+        # the stamp, then the issues (see cached_issues)
+        cache = '{}\n{}'.format(
+                self._validation_cache_stamp(context, self.data_version),
+                issues.to_json()
+        )
+        stored = Application.objects.filter(
+                pk=self.pk,
+                data_version=self.data_version
+        ).update(validation_cache=cache)
+        if stored > 0:
+            self.validation_cache = cache
 
     def clean(self, *args, **kwargs):
         if self.submitted:
@@ -151,23 +394,56 @@ class Application(Model):
                           field='semester_gpa',
                           code='invalid')
 
-    def custom_validate(self, issues):
+    def _custom_validate_financial_aids(self, issues, context):
+        """Custom validation rules for all FinancialAid records"""
+
+        for financial_aid in context.financial_aids:
+            financial_aid.custom_validate(issues)
+
+    def custom_validate(self, issues, context=None, sections=None):
         """Validate entire Application using custom logic.
 
         This custom validation component is required because Django's
         validation is simultaneously too strictly applied (i.e., model forms
         cannot be saved without validation) and too loosely defined (i.e.,
         ValidationErrors don't contain enough structured data).
+
+        Pass a CustomValidationContext to share lookups and results between
+        several validations of the same Application (e.g., within a request).
+
+        Pass a collection of sections (from VALIDATION_SECTIONS) to run only
+        their validators; see sections_affected_by. Note that a validator may
+        report issues outside of its own section: for example, the award
+        validator reports a major which is incompatible with an award as a
+        basicinfo issue.
         """
 
         if not isinstance(issues, CustomValidationIssueSet):
             raise TypeError('need a CustomValidationIssueSet')
 
-        self._custom_validate_fields(issues)
-        section_managers = [freemoney.models.Award.objects,
-                            freemoney.models.EssayPrompt.objects]
-        for section_manager in section_managers:
-            section_manager.custom_validate_for_application(self, issues)
+        if sections is None:
+            sections = set(self.VALIDATION_SECTIONS)
+        else:
+            sections = set(sections)
+            unknown = sections - set(self.VALIDATION_SECTIONS)
+            if len(unknown) > 0:
+                raise KeyError('unknown sections: ' + ', '.join(unknown))
 
-        for financial_aid in self.financialaid_set.iterator():
-            financial_aid.custom_validate(issues)
+        if context is None:
+            context = CustomValidationContext(self)
+        elif context.application is not self:
+            raise ValueError('context belongs to a different Application')
+
+        awards = freemoney.models.Award.objects
+        prompts = freemoney.models.EssayPrompt.objects
+        section_validators = [
+                ('basicinfo', self._custom_validate_fields),
+                ('award', partial(awards.custom_validate_for_application,
+                                  self, context=context)),
+                ('essay', partial(prompts.custom_validate_for_application,
+                                  self, context=context)),
+                ('finaid', partial(self._custom_validate_financial_aids,
+                                   context=context))]
+        for section, validator in section_validators:
+            if section in sections:
+                context.validate(section, validator, issues)
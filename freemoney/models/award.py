@@ -1,41 +1,95 @@
-from django.conf import settings
-from django.db.models import (Manager,
-                              Model,
+from django.db.models import (Model,
                               SET_NULL,
+                              BooleanField,
                               ForeignKey,
                               ManyToManyField,
                               SlugField,
                               TextField)
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
 from freemoney.models import (Application,
-                              Semester)
+                              CustomValidationContext,
+                              Semester,
+                              VersionedManager)
+import freemoney.models
+
+
+# Award identifiers offered in each semester, in display order
+SEMESTER_AWARDS = {
+        'Spring': ['ean_hong', 'ambassador', 'giff_albright', 'joe_conway',
+                   'daniel_summers', 'navy_marine', 'excellence', 'pledge'],
+        'Fall': ['ean_hong', 'excellence', 'pledge'],
+}
+
+
+# Eligibility rules, by Award identifier (awards not listed are unrestricted):
+#   graduating_seniors: False if those graduating this semester are excluded
+#   majors: if given, only these majors may apply...
+#   minors: ...unless one of these Application (boolean) fields is set
+AWARD_RULES = {
+        'ean_hong': {'graduating_seniors': False},
+        'ambassador': {'graduating_seniors': False},
+        'giff_albright': {'graduating_seniors': False,
+                          'majors': ['Architectural Engineering']},
+        'joe_conway': {'graduating_seniors': False,
+                       'majors': ['Engineering Science'],
+                       'minors': ['emch_minor']},
+        'navy_marine': {'graduating_seniors': False},
+        'excellence': {'graduating_seniors': False},
+        'pledge': {'graduating_seniors': False},
+}
+
+
+class AwardRules:
+    """Award eligibility rules (see AWARD_RULES), compiled into set lookups"""
+
+    def __init__(self, rules):
+        self.senior_prohibited = frozenset(
+                identifier for identifier, rule in rules.items()
+                if not rule.get('graduating_seniors', True)
+        )
+        self.major_restricted = {}
+        for identifier, rule in rules.items():
+            if 'majors' in rule:
+                self.major_restricted[identifier] = (
+                        frozenset(rule['majors']),
+                        tuple(rule.get('minors', []))
+                )
+
+    def violations(self, application, identifiers):
+        """Yield (identifier, field) for each rule broken by the selection
+
+        The field is the Application field (in the basicinfo section) which
+        makes the applicant ineligible for the Award.
+        """
 
+        if (application.semester_graduating is not None and
+            application.semester_graduating == Semester(application.due_at)):
+            for identifier in self.senior_prohibited.intersection(identifiers):
+                yield (identifier, 'semester_graduating')
 
-class AwardManager(Manager):
-    """Manager class for the Award model (see below)"""
+        # no major is an issue of its own, but doesn't exclude any award
+        if application.major != '':
+            for identifier in self.major_restricted.keys() & identifiers:
+                majors, minors = self.major_restricted[identifier]
+                if application.major in majors:
+                    continue
+                elif any(getattr(application, minor) for minor in minors):
+                    continue
+                else:
+                    yield (identifier, 'major')
+
+    def ineligible(self, application, identifiers):
+        """Return the subset of identifiers which the applicant can't get"""
+        return set(identifier for identifier, field_
+                   in self.violations(application, identifiers))
 
-    def latest_version_of(self, identifier_or_award):
-        """Return the latest version of the Award (or just an identifier)"""
-
-        if isinstance(identifier_or_award, Award):
-            identifier = identifier_or_award.identifier
-        else:
-            identifier = identifier_or_award
-
-        full_set = list(self.filter(identifier=identifier).all())
-        tail = None
-        for i in range(len(full_set)):
-            new_tail = None
-            for award in full_set:
-                if award.previous_version == tail:
-                    if new_tail is None:
-                        new_tail = award
-                    else:
-                        raise ValueError('branch detected in linked list')
-            if new_tail is None:
-                raise ValueError('split detected in linked list')
-            else:
-                tail = new_tail
-        return tail
+
+COMPILED_AWARD_RULES = AwardRules(AWARD_RULES)
+
+
+class AwardManager(VersionedManager):
+    """Manager class for the Award model (see below)"""
 
     def for_semester(self, semester=None):
         """Return the ordered list of Awards for a semester.
@@ -44,92 +98,78 @@ class AwardManager(Manager):
         list of awards for the current Spring or Fall semester, and not
         historical data or a forecast regarding past or future semesters.
 
-        By default, use the semester for FREEMONEY_DUE_DATE (in settings).
+        By default, use the semester of the current cycle (FREEMONEY_DUE_DATE).
         """
 
         if semester == None:
-            semester = Semester(settings.FREEMONEY_DUE_DATE)
+            semester = freemoney.models.get_current_cycle().semester
+
+        catalog = freemoney.models.get_catalog()
+        return catalog.awards_for_semester(semester)
 
-        year = semester.date.year
-        if semester == Semester(('Spring', year)):
-            slugs = ['ean_hong', 'ambassador', 'giff_albright', 'joe_conway',
-                     'daniel_summers', 'navy_marine', 'excellence', 'pledge']
-        elif semester == Semester(('Fall', year)):
-            slugs = ['ean_hong', 'excellence', 'pledge']
+    def sections_needed_by(self, application):
+        """Return the optional sections which an application's awards need
 
-        return [self.latest_version_of(slug) for slug in slugs]
+        See Award.SECTION_FLAGS. Only the latest version of an Award counts.
+        """
+
+        award_ids = set(award.pk for award in application.award_set.all())
+        return freemoney.models.get_catalog().sections_needed_by(award_ids)
 
     def check_app_needs_finaid(self, application):
         """True if an application needs financial aid page"""
-        checked_awards = set([self.latest_version_of('ean_hong'),
-                              self.latest_version_of('ambassador'),
-                              self.latest_version_of('giff_albright'),
-                              self.latest_version_of('joe_conway'),
-                              self.latest_version_of('navy_marine')])
-        for selection in application.award_set.iterator():
-            if selection in checked_awards:
-                return True
-        return False
+        return 'finaid' in self.sections_needed_by(application)
 
     def check_app_needs_essay(self, application):
         """True if an application needs the essay page"""
-        checked_awards = set([self.latest_version_of('ean_hong'),
-                              self.latest_version_of('ambassador'),
-                              self.latest_version_of('giff_albright')])
-        for selection in application.award_set.iterator():
-            if selection in checked_awards:
-                return True
-        return False
-
-    def custom_validate_for_application(self, application, issues):
+        return 'essay' in self.sections_needed_by(application)
+
+    def ineligible_selections(self, applications):
+        """Map each Application to the identifiers of its ineligible awards
+
+        Only the Awards which each applicant has selected are considered. To
+        avoid a query per Application, pass a QuerySet which prefetches the
+        awards (e.g., Application.objects.prefetched()).
+        """
+
+        report = {}
+        for application in applications:
+            selected_identifiers = set(award.identifier for award
+                                       in application.award_set.all())
+            report[application] = COMPILED_AWARD_RULES.ineligible(
+                    application,
+                    selected_identifiers
+            )
+        return report
+
+    def custom_validate_for_application(self, application, issues,
+                                        context=None):
         """Perform check on an application (for CustomValidationIssues)"""
 
-        this_semester_awards = self.for_semester(Semester(application.due_at))
+        if context is None:
+            context = CustomValidationContext(application)
 
-        for index, selection in enumerate(application.award_set.iterator()):
+        this_semester_awards = context.catalog.awards_for_semester(
+                Semester(application.due_at)
+        )
+
+        selected_identifiers = set()
+        for selection in context.awards:
             if selection not in this_semester_awards:
                 issues.create(section='award',
                               field='[records]',
                               code='invalid')
+            selected_identifiers.add(selection.identifier)
+
+        # e.g., graduating seniors and certain majors are excluded
+        for identifier_, field in COMPILED_AWARD_RULES.violations(
+                application,
+                selected_identifiers):
+            issues.create(section='basicinfo',
+                          field=field,
+                          code='prohibited')
 
-            # Graduating seniors can only apply for certain awards
-            if application.semester_graduating is None:
-                pass
-            elif (application.semester_graduating ==
-                  Semester(application.due_at)):
-                if selection.identifier in set(['giff_albright', 'joe_conway',
-                                                'ambassador', 'navy_marine',
-                                                'excellence', 'pledge',
-                                                'ean_hong']):
-                    issues.create(section='basicinfo',
-                                  field='semester_graduating',
-                                  code='prohibited')
-
-            # Only AEs can apply for the Giff Albright award
-            if application.major == '':
-                pass
-            elif application.major == 'Architectural Engineering':
-                pass
-            else:
-                if selection.identifier == 'giff_albright':
-                    issues.create(section='basicinfo',
-                                    field='major',
-                                    code='prohibited')
-
-            # Only E SC and E MCH can apply for the Joe Conway award
-            if application.major == '':
-                pass
-            elif application.major == 'Engineering Science':
-                pass
-            elif application.emch_minor == True:
-                pass
-            else:
-                if selection.identifier == 'joe_conway':
-                    issues.create(section='basicinfo',
-                                    field='major',
-                                    code='prohibited')
-
-        if application.award_set.count() < 1:
+        if len(context.awards) < 1:
             issues.create(section='award', code='min-length')
 
 
@@ -139,6 +179,9 @@ class Award(Model):
     identifier = SlugField()
     name = TextField()
     description = TextField()
+    # (None until saved, if not given; see save)
+    needs_finaid = BooleanField(default=None)
+    needs_essay = BooleanField(default=None)
     previous_version = ForeignKey('Award',
                                   null=True,
                                   blank=True,
@@ -146,3 +189,37 @@ class Award(Model):
     application_set = ManyToManyField(Application)
 
     objects = AwardManager()
+
+    # Optional sections (and wizard pages), by the flag which requires them
+    SECTION_FLAGS = {'finaid': 'needs_finaid',
+                     'essay': 'needs_essay'}
+
+    def save(self, *args, **kwargs):
+        """Save the Award, filling in any section flags which were not given
+
+        A flag left unset (None) is copied from the previous version, if
+        there is one, and is otherwise False.
+        """
+
+        for flag in Award.SECTION_FLAGS.values():
+            if getattr(self, flag) is None:
+                if self.previous_version is not None:
+                    setattr(self, flag, getattr(self.previous_version, flag))
+                else:
+                    setattr(self, flag, False)
+        return super(Award, self).save(*args, **kwargs)
+
+
+@receiver(m2m_changed, sender=Award.application_set.through)
+def _bump_data_version_on_selection(instance, action, pk_set, **kwargs_):
+    if isinstance(instance, Application):
+        if (action in ('post_add', 'post_remove', 'post_clear') and
+            not instance.data_version_deferred):
+            instance.bump_data_version()
+    elif action in ('post_add', 'post_remove'):
+        Application.objects.bump_data_version(pk_set)
+    elif action == 'pre_clear':
+        # (afterwards, the Applications could no longer be identified)
+        Application.objects.bump_data_version(
+                instance.application_set.values_list('pk', flat=True)
+        )
@@ -0,0 +1,179 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import (Model,
+                              F,
+                              Max,
+                              PositiveIntegerField)
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from freemoney.models import (Award,
+                              EssayPrompt)
+from freemoney.models.award import SEMESTER_AWARDS
+from freemoney.models.essay import AWARD_PROMPTS
+
+
+class Catalog:
+    """Snapshot of the latest Award and EssayPrompt definitions.
+
+    Awards and EssayPrompts change perhaps once a semester, so the structures
+    derived from them (the awards offered each semester, the prompts for each
+    award, the optional sections needed by each award, and the latest version
+    of each identifier) are built only once per process and then shared
+    between requests. See get_catalog.
+
+    A Catalog is never modified after construction (apart from its memo; see
+    memoize). The collections returned by its methods are copies, which
+    callers are free to alter.
+    """
+
+    def __init__(self, stamp):
+        self.stamp = stamp
+        self._memo = {}
+
+        award_identifiers = set()
+        for identifiers in SEMESTER_AWARDS.values():
+            award_identifiers.update(identifiers)
+        self._awards = Award.objects.latest_versions_of(award_identifiers)
+
+        prompt_identifiers = set()
+        for identifiers in AWARD_PROMPTS.values():
+            for identifier_or_subset in identifiers:
+                if isinstance(identifier_or_subset, list):
+                    prompt_identifiers.update(identifier_or_subset)
+                else:
+                    prompt_identifiers.add(identifier_or_subset)
+        self._prompts = EssayPrompt.objects.latest_versions_of(
+                prompt_identifiers
+        )
+
+        self._section_award_ids = {}
+        for section, flag in Award.SECTION_FLAGS.items():
+            self._section_award_ids[section] = frozenset(
+                    award.pk for award in self._awards.values()
+                    if award is not None and getattr(award, flag)
+            )
+
+        self._semester_awards = {}
+        for semester_type, identifiers in SEMESTER_AWARDS.items():
+            self._semester_awards[semester_type] = tuple(
+                    self._awards[identifier] for identifier in identifiers
+            )
+
+        self._award_prompts = {}
+        for award_identifier, identifiers in AWARD_PROMPTS.items():
+            prompts = []
+            for identifier_or_subset in identifiers:
+                if isinstance(identifier_or_subset, list):
+                    prompts.append(tuple(self._prompts[identifier]
+                                         for identifier
+                                         in identifier_or_subset))
+                else:
+                    prompts.append(self._prompts[identifier_or_subset])
+            self._award_prompts[award_identifier] = tuple(prompts)
+
+    def memoize(self, key, compute):
+        """Return compute() for a hashable key, computing it just once
+
+        Results are discarded along with the Catalog, so compute should
+        depend only on the key and on the Catalog itself. Results are
+        shared, so they should be immutable (e.g., tuples).
+        """
+
+        try:
+            return self._memo[key]
+        except KeyError:
+            return self._memo.setdefault(key, compute())
+
+    def latest_award(self, identifier):
+        """Return the latest version of a (well-known) Award identifier"""
+        return self._awards[identifier]
+
+    def latest_prompt(self, identifier):
+        """Return the latest version of a (well-known) EssayPrompt"""
+        return self._prompts[identifier]
+
+    def sections_needed_by(self, award_ids):
+        """Return the optional sections needed by any of the Award pks"""
+        return set(section for section, needing_ids
+                   in self._section_award_ids.items()
+                   if not needing_ids.isdisjoint(award_ids))
+
+    def awards_for_semester(self, semester):
+        """Return the ordered list of Awards for a Semester (year ignored)"""
+        semester_type = semester.semester_tuple[0]
+        return list(self._semester_awards[semester_type])
+
+    def prompts_for_award(self, identifier):
+        """Return the (maybe-grouped) list of EssayPrompts for an Award"""
+        prompts = []
+        for prompt_or_subset in self._award_prompts.get(identifier, ()):
+            if isinstance(prompt_or_subset, tuple):
+                prompts.append(list(prompt_or_subset))
+            else:
+                prompts.append(prompt_or_subset)
+        return prompts
+
+
+class CatalogVersion(Model):
+    """Counts the changes to Awards and EssayPrompts (see get_catalog)
+
+    There is (at most) one row, which is updated along with every Award or
+    EssayPrompt that is saved or deleted, in the same transaction. So every
+    process which reads it computes the same stamp for the same rows.
+    """
+
+    version = PositiveIntegerField(default=0)
+
+
+def _database_stamp():
+    version = CatalogVersion.objects.aggregate(
+            version=Max('version')
+    )['version']
+    return str(version or 0)
+
+
+def _bump_database_stamp():
+    if CatalogVersion.objects.update(version=F('version') + 1) == 0:
+        CatalogVersion.objects.create(version=1)
+
+
+# The stamp is read from the database at most once per _STAMP_TIMEOUT seconds
+# (per process, or in total if CACHES names a shared cache); invalidating the
+# catalog forgets it at once, but only in this process unless it is shared
+_STAMP_KEY = 'freemoney.catalog.stamp'
+_STAMP_TIMEOUT = 60
+_catalog = None
+
+
+def get_catalog():
+    """Return the current Catalog, (re)building it only if it is outdated"""
+
+    global _catalog
+    stamp = cache.get(_STAMP_KEY)
+    if stamp is None:
+        stamp = _database_stamp()
+        cache.set(_STAMP_KEY, stamp, timeout=_STAMP_TIMEOUT)
+    catalog = _catalog
+    if catalog is None or catalog.stamp != stamp:
+        catalog = Catalog(stamp)
+        _catalog = catalog
+    return catalog
+
+
+def invalidate_catalog():
+    """Force the Catalog to be checked against the database before next use"""
+
+    global _catalog
+    _catalog = None
+    cache.delete(_STAMP_KEY)
+
+
+@receiver(post_save, sender=Award)
+@receiver(post_delete, sender=Award)
+@receiver(post_save, sender=EssayPrompt)
+@receiver(post_delete, sender=EssayPrompt)
+def _invalidate_catalog_on_change(**kwargs_):
+    _bump_database_stamp()
+    # until the change is committed, other connections would rebuild from
+    # (and then keep) the old rows
+    transaction.on_commit(invalidate_catalog)
@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from freemoney.models import Semester
+from freemoney.models.award import SEMESTER_AWARDS
+
+
+class Cycle:
+    """The application cycle which is currently open (see get_current_cycle).
+
+    A Cycle is derived entirely from the FREEMONEY_DUE_DATE setting:
+
+      * due_at is the deadline itself
+      * semester is the Semester in which the deadline falls
+      * award_identifiers are the (ordered) Award slugs for that Semester
+      * starts_at and ends_at bound the Semester, in due_at's own timezone,
+        so that any Application whose due_at lies in [starts_at, ends_at)
+        belongs to it (due_at itself always does)
+
+    A Cycle is never modified after construction.
+    """
+
+    def __init__(self, due_at):
+        self.due_at = due_at
+        self.semester = Semester(due_at)
+        semester_type, year = self.semester.semester_tuple
+        self.award_identifiers = tuple(SEMESTER_AWARDS[semester_type])
+        if self.semester.is_spring:
+            self.starts_at = self._midnight(year, 1, 1)
+            self.ends_at = self._midnight(year, 6, 1)
+        else:
+            self.starts_at = self._midnight(year, 8, 1)
+            self.ends_at = self._midnight(year+1, 1, 1)
+
+    def _midnight(self, year, month, day):
+        # the semester is that of due_at's local date, so use the same offset
+        return self.due_at.replace(year=year, month=month, day=day, hour=0,
+                                   minute=0, second=0, microsecond=0)
+
+
+_cycle = None
+
+
+def get_current_cycle():
+    """Return the Cycle for the current settings, building it on first use"""
+
+    global _cycle
+    cycle = _cycle
+    if cycle is None:
+        cycle = Cycle(settings.FREEMONEY_DUE_DATE)
+        _cycle = cycle
+    return cycle
+
+
+@receiver(setting_changed)
+def _reset_cycle_on_setting_change(setting, **kwargs_):
+    global _cycle
+    if setting == 'FREEMONEY_DUE_DATE':
+        _cycle = None
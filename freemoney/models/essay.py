@@ -1,7 +1,6 @@
 from datetime import datetime, timedelta, timezone
 from django.conf import settings
-from django.db.models import (Manager,
-                              Model,
+from django.db.models import (Model,
                               CASCADE,
                               SET_NULL,
                               ForeignKey,
@@ -9,39 +8,41 @@ from django.db.models import (Manager,
                               ManyToManyField,
                               SlugField,
                               TextField)
+from django.db.models.signals import post_save
+from django.dispatch import receiver
 from freemoney.models import (Application,
                               Award,
-                              Semester)
+                              CustomValidationContext,
+                              Semester,
+                              VersionedManager)
+import freemoney.models
+
+
+# EssayPrompt identifiers for each Award identifier (see for_award below)
+AWARD_PROMPTS = {
+        'giff_albright': ['giff_visit_review'],
+        'ean_hong': [['newmember_involvement_previous',
+                      'established_involvement_outside'],
+#                     ['newmember_coe_friends',
+#                      'established_coe_friends',
+#                      'newmember_coe_community_plans'],
+                     ['newmember_plans_from_others',
+                      'established_your_legacy_friendship',
+                      'established_your_legacy_accomplishments']],
+        'ambassador': [['newmember_involvement_previous',
+                        'established_involvement_outside'],
+                       ['newmember_previous_leadership',
+                        'newmember_greek_relations_plans',
+                        'newmember_greek_relations_accomplishments',
+                        'established_community_leadership',
+                        'established_greek_relations_accomplishments']],
+        'dan_summers': ['dpan_established_coe_friends'],
+}
 
 
-class EssayManager(Manager):
+class EssayManager(VersionedManager):
     """Manager class for the EssayPrompt (and Essay, transitively) classes"""
 
-    def latest_version_of(self, prompt_or_identifier):
-        """Return the latest version of the EssayPrompt (or identifier)"""
-
-        if isinstance(prompt_or_identifier, EssayPrompt):
-            identifier = prompt_or_identifier.identifier
-        else:
-            identifier = prompt_or_identifier
-
-        # TODO: de-duplicate this code against AwardManager...
-        full_set = list(self.filter(identifier=identifier).all())
-        tail = None
-        for i in range(len(full_set)):
-            new_tail = None
-            for prompt in full_set:
-                if prompt.previous_version == tail:
-                    if new_tail is None:
-                        new_tail = prompt
-                    else:
-                        raise ValueError('branch detected in linked list')
-            if new_tail is None:
-                raise ValueError('split detected in linked list')
-            else:
-                tail = new_tail
-        return tail
-
     def for_award(self, award_or_identifier):
         """Return the (maybe-grouped) collection of EssayPrompts for an Award.
 
@@ -56,49 +57,13 @@ class EssayManager(Manager):
         """
 
         if isinstance(award_or_identifier, Award):
-            award = award_or_identifier
-        else:
-            award = Award.objects.latest_version_of(award_or_identifier)
-
-        if award.identifier == 'giff_albright':
-            prompts = ['giff_visit_review']
-        elif award.identifier == 'ean_hong':
-            prompts = [['newmember_involvement_previous',
-                        'established_involvement_outside'],
-#                       ['newmember_coe_friends',
-#                        'established_coe_friends',
-#                        'newmember_coe_community_plans'],
-                       ['newmember_plans_from_others',
-                        'established_your_legacy_friendship',
-                        'established_your_legacy_accomplishments']]
-        elif award.identifier == 'ambassador':
-            prompts = [['newmember_involvement_previous',
-                        'established_involvement_outside'],
-                       ['newmember_previous_leadership',
-                        'newmember_greek_relations_plans',
-                        'newmember_greek_relations_accomplishments',
-                        'established_community_leadership',
-                        'established_greek_relations_accomplishments']]
-        elif award.identifier == 'dan_summers':
-            prompts = ['dpan_established_coe_friends']
+            identifier = award_or_identifier.identifier
         else:
-            prompts = []
-
-        real_prompts = []
-        for identifier_or_subset in prompts:
-            if isinstance(identifier_or_subset, list):
-                subset = []
-                for identifier in identifier_or_subset:
-                    subset.append(self.latest_version_of(identifier))
-                real_prompts.append(subset)
-            else:
-                real_prompts.append(self.latest_version_of(
-                        identifier_or_subset
-                ))
+            identifier = award_or_identifier
 
-        return real_prompts
+        return freemoney.models.get_catalog().prompts_for_award(identifier)
 
-    def for_application(self, application):
+    def for_application(self, application, context=None):
         """Return the full collection of EssayPrompts for a particular app."""
 
         # TODO: probably should handle a possible KeyError/AttributeError
@@ -123,12 +88,36 @@ class EssayManager(Manager):
         else:
             is_new_enough = False
 
+        if context is None:
+            awards = application.award_set.all()
+            catalog = freemoney.models.get_catalog()
+        else:
+            awards = context.awards
+            catalog = context.catalog
+
+        # only a handful of combinations ever occur, so share the results
+        awards = sorted(awards, key=lambda award: award.pk)
+        key = ('essay_prompts_for_awards',
+               frozenset(award.pk for award in awards),
+               is_new_enough)
+        essays = catalog.memoize(key, lambda: self._select_prompts(
+                catalog,
+                awards,
+                is_new_enough
+        ))
+        return [list(x) if isinstance(x, tuple) else x for x in essays]
+
+    def _select_prompts(self, catalog, awards, is_new_enough):
+        """Compute for_application (as a tuple of prompts and subtuples)"""
+
         essays = []
-        for award in application.award_set.iterator():
+        selected = set()
+        for award in awards:
             # TODO: implement the always-in-same-group rule as
             # specified in the for_award docstring; for now, it is
             # assumed that it is in effect
-            for prompt_or_subset in self.for_award(award):
+            for prompt_or_subset in catalog.prompts_for_award(
+                    award.identifier):
                 subset = None
                 if isinstance(prompt_or_subset, EssayPrompt):
                     subset = [prompt_or_subset]
@@ -136,20 +125,8 @@ class EssayManager(Manager):
                     subset = prompt_or_subset
 
                 filtered_subset = []
-                detected = False
                 for prompt in subset:
-                    for inner_prompt_or_subset in essays:
-                        inner_subset = None
-                        if isinstance(inner_prompt_or_subset, EssayPrompt):
-                            inner_subset = [inner_prompt_or_subset]
-                        else:
-                            inner_subset = inner_prompt_or_subset
-                        for inner_prompt in inner_subset:
-                            if inner_prompt == prompt:
-                                detected = True
-                                break
-
-                    if detected:
+                    if prompt in selected:
                         continue
 
                     if (is_new_enough and
@@ -161,29 +138,30 @@ class EssayManager(Manager):
                     elif (not prompt.identifier.startswith('newmember') and
                           not prompt.identifier.startswith('established')):
                         filtered_subset.append(prompt)
+                selected.update(filtered_subset)
 
                 if len(filtered_subset) == 1:
                     essays.append(filtered_subset[0])
                 elif len(filtered_subset) > 1:
-                    essays.append(filtered_subset)
+                    essays.append(tuple(filtered_subset))
 
-        return essays
+        return tuple(essays)
 
-    def custom_validate_for_application(self, application, issues):
+    def custom_validate_for_application(self, application, issues,
+                                        context=None):
         """Perform check on an application (for CustomValidationIssues)"""
 
-        all_responses = list(Essay.objects.filter(application=application))
-        for response in all_responses:
+        if context is None:
+            context = CustomValidationContext(application)
+
+        responses_by_prompt = {}
+        for response in context.essays:
             response.custom_validate(issues)
+            responses_by_prompt[response.prompt_id] = response
 
-        for prompt_or_subset in self.for_application(application):
+        for prompt_or_subset in self.for_application(application, context):
             if isinstance(prompt_or_subset, EssayPrompt):
-                found = False
-                for response in all_responses:
-                    if response.prompt == prompt_or_subset:
-                        found = True
-                        break
-                if not found:
+                if prompt_or_subset.pk not in responses_by_prompt:
                     issues.create(section='essay',
                                   field='[responses]',
                                   subfield=prompt_or_subset.pk,
@@ -192,11 +170,8 @@ class EssayManager(Manager):
                 subset = prompt_or_subset
                 found = False
                 for prompt in subset:
-                    for response in all_responses:
-                        if response.prompt == prompt:
-                            found = True
-                            break
-                    if found is True:
+                    if prompt.pk in responses_by_prompt:
+                        found = True
                         break
                 if not found:
                     if len(subset) > 0:
@@ -230,10 +205,26 @@ class Essay(Model):
     prompt = ForeignKey('EssayPrompt', on_delete=CASCADE)
     response = TextField()
 
+    def delete(self, *args, **kwargs):
+        """Delete the response, incrementing the Application's data_version
+
+        (A post_delete receiver would also stop Django from deleting a
+        QuerySet of Essays with a single query.)
+        """
+
+        deleted = super(Essay, self).delete(*args, **kwargs)
+        Application.bump_data_version_of(self)
+        return deleted
+
     def custom_validate(self, issues):
         word_limit_with_grace = int(self.prompt.word_limit * 1.2)
         if len(self.response.split()) > word_limit_with_grace:
             issues.create(section='essay',
                           field='[responses]',
-                          subfield=self.prompt.pk,
+                          subfield=self.prompt_id,
                           code='max-length')
+
+
+@receiver(post_save, sender=Essay)
+def _bump_data_version_on_change(instance, **kwargs_):
+    Application.bump_data_version_of(instance)
@@ -1,11 +1,13 @@
-from django.conf import settings
 from django.db.models import (Model,
                               CASCADE,
                               FloatField,
                               ForeignKey,
                               SlugField,
                               TextField)
-from freemoney.models import Semester, SemesterField
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from freemoney.models import SemesterField
+import freemoney.models
 
 
 class FinancialAid(Model):
@@ -32,6 +34,17 @@ class FinancialAid(Model):
             raise ValueError('cannot calculate using frequency: ' +
                              self.installment_frequency)
 
+    def delete(self, *args, **kwargs):
+        """Delete the record, incrementing the Application's data_version
+
+        (A post_delete receiver would also stop Django from deleting a
+        QuerySet of FinancialAids with a single query.)
+        """
+
+        deleted = super(FinancialAid, self).delete(*args, **kwargs)
+        freemoney.models.Application.bump_data_version_of(self)
+        return deleted
+
     def custom_validate(self, issues):
         """This is "custom" validation as per Application.custom_validate"""
 
@@ -66,8 +79,14 @@ class FinancialAid(Model):
                           code='invalid')
 
         if self.semester_finished is not None:
-            if self.semester_finished < Semester(settings.FREEMONEY_DUE_DATE):
+            current_cycle = freemoney.models.get_current_cycle()
+            if self.semester_finished < current_cycle.semester:
                 issues.create(section='finaid',
                             field='semester_finished',
                             subfield=self.pk,
                             code='invalid')
+
+
+@receiver(post_save, sender=FinancialAid)
+def _bump_data_version_on_change(instance, **kwargs_):
+    freemoney.models.Application.bump_data_version_of(instance)
@@ -5,20 +5,29 @@ from django.db.models import(Model,
                              BooleanField,
                              ForeignKey,
                              OneToOneField)
-from freemoney.models import (Application,
-                              Semester)
+from django.utils.functional import cached_property
+from freemoney.models import Application
+import freemoney.models
 
 
 class ApplicantProfileManager(Manager):
     def active_profiles(self):
-        """Get all active ApplicantProfiles with a current Application"""
+        """Get all active ApplicantProfiles with a current Application
 
-        filtered_profiles = []
-        for profile in self.iterator():
-            if profile.user.is_active:
-                if profile.current_application is not None:
-                    filtered_profiles.append(profile)
-        return filtered_profiles
+        The result is an (ordered) QuerySet, which can be further filtered or
+        paginated. Each profile's user is fetched along with it, so that the
+        whole listing takes a single query.
+        """
+
+        current_cycle = freemoney.models.get_current_cycle()
+        current_applications = Application.objects.filter(
+                due_at__gte=current_cycle.starts_at,
+                due_at__lt=current_cycle.ends_at
+        )
+        return self.select_related('user').filter(
+                user__is_active=True,
+                pk__in=current_applications.values('applicant')
+        ).order_by('pk')
 
 class ApplicantProfile(Model):
     """Extra user profile info for a potential applicant's account"""
@@ -30,16 +39,42 @@ class ApplicantProfile(Model):
 
     objects = ApplicantProfileManager()
 
-    @property
+    @cached_property
     def current_application(self):
-        candidate_applications = []
-        for application in self.application_set.iterator():
-            if (Semester(application.due_at) ==
-                Semester(settings.FREEMONEY_DUE_DATE)):
-                candidate_applications.append(application)
+        """The Application (if any) which is due in the current cycle
+
+        The Application is loaded along with its related records (see
+        ApplicationManager.prefetched). The result is cached on this
+        ApplicantProfile object. If a new current Application is created,
+        reassign (or delete) this attribute.
+        """
+
+        current_cycle = freemoney.models.get_current_cycle()
+        candidates = self.application_set.prefetched().filter(
+                due_at__gte=current_cycle.starts_at,
+                due_at__lt=current_cycle.ends_at
+        )
+        # fetching a second Application is enough to detect duplicates
+        candidate_applications = list(candidates[:2])
         if len(candidate_applications) == 0:
             return None
         elif len(candidate_applications) == 1:
             return candidate_applications.pop()
         else:
             raise Application.MultipleObjectsReturned()
+
+    def lock_current_application(self):
+        """Lock the current Application until the end of the transaction
+
+        Concurrent requests which lock the same Application must wait for
+        this transaction to finish. The current_application attribute is
+        then reloaded (on next use), so that it reflects any changes which
+        were made before the lock was obtained.
+        """
+
+        current_cycle = freemoney.models.get_current_cycle()
+        list(self.application_set.select_for_update().filter(
+                due_at__gte=current_cycle.starts_at,
+                due_at__lt=current_cycle.ends_at
+        ).values_list('pk', flat=True))
+        self.__dict__.pop('current_application', None)
@@ -1,11 +1,9 @@
 from django.core import exceptions
 from django.db import models
 import datetime
-import functools
 import re
 
 
-@functools.total_ordering
 class Semester:
     """Represents the pairing of a semester and a year.
 
@@ -16,19 +14,28 @@ class Semester:
       * A datetime.date
       * A string of the form "Spring 2017" or "FA11"
       * A tuple like ("fall", 2016)
+
+    Semesters are interned: equal Semesters are the very same object, and
+    everything about them is worked out just once. Each is identified by an
+    integer ordinal (year*2, plus one for Fall), so that hashing and ordering
+    are simple integer operations.
     """
 
+    __slots__ = ('_ordinal', '_inner_date', '_tuple', '_str')
+
     STRUCTURE_REGEX = re.compile(r'^([a-zA-Z]+)\s*(\d{2}|\d{4})$')
     SPRING_REGEX = re.compile(r'^sp(?:ring)?$', re.IGNORECASE)
     FALL_REGEX = re.compile(r'^fa(?:ll)?$', re.IGNORECASE)
 
-    def __init__(self, value):
+    # the interned Semesters, keyed by ordinal
+    _interned = {}
+
+    def __new__(cls, value):
         if isinstance(value, Semester):
-            self._inner_date = value._inner_date
+            return value
         elif isinstance(value, datetime.date):
             semester = Semester.month_day_to_semester(value.month, value.day)
-            month, day = Semester.semester_to_month_day(semester)
-            self._inner_date = datetime.date(value.year, month, day)
+            year = value.year
         elif isinstance(value, str):
             match = Semester.STRUCTURE_REGEX.match(value)
             if match is None:
@@ -39,24 +46,59 @@ class Semester:
                 semester, year = match.group(1), int(match.group(2))
                 if year < 100:
                     year += 2000     # from two-digit year to four-digit
-                month, day = Semester.semester_to_month_day(semester)
-                self._inner_date = datetime.date(year, month, day)
         elif isinstance(value, tuple):
             semester, year = value[0], int(value[1])
             if year < 100:
                 year += 2000         # from two-digit year to four-digit
-            month, day = Semester.semester_to_month_day(semester)
-            self._inner_date = datetime.date(year, month, day)
         else:
             raise TypeError('invalid type for semester descriptor')
 
+        month, day_ = Semester.semester_to_month_day(semester)
+        ordinal = year*2 + (1 if month >= 8 else 0)
+        interned = Semester._interned.get(ordinal)
+        if interned is None:
+            interned = Semester._interned.setdefault(
+                    ordinal,
+                    Semester._from_ordinal(ordinal)
+            )
+        return interned
+
+    @staticmethod
+    def _from_ordinal(ordinal):
+        """Construct a brand-new (not yet interned) Semester"""
+
+        self = object.__new__(Semester)
+        year, is_fall = divmod(ordinal, 2)
+        semester = 'Fall' if is_fall else 'Spring'
+        month, day = Semester.semester_to_month_day(semester)
+        object.__setattr__(self, '_ordinal', ordinal)
+        object.__setattr__(self, '_inner_date',
+                           datetime.date(year, month, day))
+        object.__setattr__(self, '_tuple', (semester, year))
+        object.__setattr__(self, '_str', '{} {}'.format(semester, year))
+        return self
+
+    def __setattr__(self, name_, value_):
+        raise AttributeError('Semester objects are immutable')
+
+    def __delattr__(self, name_):
+        raise AttributeError('Semester objects are immutable')
+
+    def __reduce__(self):
+        # unpickling (and copying) must go through the interning constructor
+        return (Semester, (self._tuple,))
+
+    @property
+    def ordinal(self):
+        return self._ordinal
+
     @property
     def is_spring(self):
-        return (Semester(('Spring', self.date.year)) == self)
+        return self._ordinal % 2 == 0
 
     @property
     def is_fall(self):
-        return (Semester(('Fall', self.date.year)) == self)
+        return self._ordinal % 2 == 1
 
     @property
     def date(self):
@@ -64,27 +106,44 @@ class Semester:
 
     @property
     def semester_tuple(self):
-        if self.is_fall:
-            return ('Fall', self.date.year)
-        elif self.is_spring:
-            return ('Spring', self.date.year)
-        else:
-            raise ValueError('Invalid semestertype (Fall/Spring)')
+        return self._tuple
 
     def __str__(self):
-        semester = Semester.month_day_to_semester(self._inner_date.month,
-                                                  self._inner_date.day)
-        return '{} {}'.format(semester, self._inner_date.year)
+        return self._str
+
+    def __hash__(self):
+        return hash(self._ordinal)
 
     def __eq__(self, other):
         if isinstance(other, Semester):
-            return self.date == Semester(other).date
+            return self._ordinal == other._ordinal
         else:
             return False
 
+    def __ne__(self, other):
+        return not self == other
+
     def __gt__(self, other):
         if isinstance(other, Semester):
-            return self.date > Semester(other).date
+            return self._ordinal > other._ordinal
+        else:
+            raise TypeError('can only order Semesters with other Semesters')
+
+    def __ge__(self, other):
+        if isinstance(other, Semester):
+            return self._ordinal >= other._ordinal
+        else:
+            raise TypeError('can only order Semesters with other Semesters')
+
+    def __lt__(self, other):
+        if isinstance(other, Semester):
+            return self._ordinal < other._ordinal
+        else:
+            raise TypeError('can only order Semesters with other Semesters')
+
+    def __le__(self, other):
+        if isinstance(other, Semester):
+            return self._ordinal <= other._ordinal
         else:
             raise TypeError('can only order Semesters with other Semesters')
 
@@ -1,11 +1,15 @@
 from datetime import datetime, timezone
 from django.contrib.auth import get_user_model
 from django.core.validators import ValidationError
+from django.db import IntegrityError, transaction
 from django.test import TestCase
 from freemoney.models import (Application,
                               ApplicantProfile,
+                              Award,
+                              CustomValidationContext,
                               CustomValidationIssue,
                               CustomValidationIssueSet,
+                              FinancialAid,
                               Semester)
 
 
@@ -105,3 +109,222 @@ class ApplicationValidationTests(TestCase):
                 valids=(0.0, 2.05, 4.00),
                 invalids=(4.01, -0.01)
         )
+
+
+class ApplicationValidationContextTests(TestCase):
+    """Verify that a CustomValidationContext memoizes validation work"""
+
+    def setUp(self):
+        self.applicant = ApplicantProfile.objects.create(
+                user=get_user_model().objects.create_user(
+                    username='test@example.com',
+                    password='pass1234'
+                    ),
+                must_change_password=False
+        )
+        self.application = Application.objects.create(
+                applicant=self.applicant,
+                due_at = datetime(2016, 11, 15, tzinfo=timezone.utc)
+        )
+        self.application.award_set.add(
+                Award.objects.latest_version_of('ean_hong')
+        )
+        self.context = CustomValidationContext(self.application)
+
+    def test_memoized(self):
+        """Validating again with the same context issues no queries"""
+
+        first_issues = CustomValidationIssueSet()
+        self.application.custom_validate(first_issues, self.context)
+        second_issues = CustomValidationIssueSet()
+        with self.assertNumQueries(0):
+            self.application.custom_validate(second_issues, self.context)
+        self.assertSetEqual(set(str(x) for x in first_issues),
+                            set(str(x) for x in second_issues))
+
+    def test_invalidate(self):
+        """Only the invalidated data is looked up again"""
+
+        issues = CustomValidationIssueSet()
+        self.application.custom_validate(issues, self.context)
+        self.assertEqual(0, len(issues.search(section='finaid')))
+
+        FinancialAid.objects.create(application=self.application)
+        self.context.invalidate('finaid')
+        issues = CustomValidationIssueSet()
+        with self.assertNumQueries(1):
+            self.application.custom_validate(issues, self.context)
+        self.assertNotEqual(0, len(issues.search(section='finaid')))
+
+    def test_prefetched(self):
+        """A prefetched Application is validated without further queries"""
+
+        FinancialAid.objects.create(application=self.application)
+        Award.objects.check_app_needs_essay(self.application)  # warm catalog
+        with self.assertNumQueries(4):
+            application = Application.objects.prefetched().get(
+                    pk=self.application.pk
+            )
+        context = CustomValidationContext(application)
+        issues = CustomValidationIssueSet()
+        with self.assertNumQueries(0):
+            application.custom_validate(issues, context)
+            self.assertTrue(Award.objects.check_app_needs_finaid(application))
+            self.assertTrue(Award.objects.check_app_needs_essay(application))
+        self.assertNotEqual(0, len(issues.search(section='finaid')))
+
+        FinancialAid.objects.filter(application=application).delete()
+        context.invalidate('finaid')
+        issues = CustomValidationIssueSet()
+        with self.assertNumQueries(1):
+            application.custom_validate(issues, context)
+        self.assertEqual(0, len(issues.search(section='finaid')))
+
+    def test_wrong_application(self):
+        """A context cannot be shared between Applications"""
+
+        other = Application.objects.create(
+                applicant=self.applicant,
+                due_at = datetime(2016, 11, 15, tzinfo=timezone.utc)
+        )
+        with self.assertRaises(ValueError):
+            other.custom_validate(CustomValidationIssueSet(), self.context)
+
+    def test_sections(self):
+        """Validate only some sections of an Application"""
+
+        FinancialAid.objects.create(application=self.application)
+        issues = CustomValidationIssueSet()
+        self.application.custom_validate(issues, sections={'finaid'})
+        self.assertNotEqual(0, len(issues))
+        self.assertEqual(len(issues), len(issues.search(section='finaid')))
+
+        with self.assertRaises(KeyError):
+            self.application.custom_validate(issues, sections={'bogus'})
+
+    def test_sections_affected_by(self):
+        """Changes to some fields affect the validation of other sections"""
+
+        self.assertSetEqual({'finaid'},
+                            Application.sections_affected_by(['finaid']))
+        self.assertSetEqual({'basicinfo'},
+                            Application.sections_affected_by(['phone']))
+        self.assertSetEqual({'basicinfo', 'award'},
+                            Application.sections_affected_by(['major']))
+        self.assertSetEqual({'basicinfo', 'award', 'essay', 'finaid'},
+                            Application.sections_affected_by(['basicinfo',
+                                                              'finaid']))
+        with self.assertRaises(KeyError):
+            Application.sections_affected_by(['bogus'])
+
+    def test_stored_issues(self):
+        """Stored issues are reused until the data_version changes"""
+
+        self.assertIsNone(self.application.cached_issues(self.context))
+        issues = CustomValidationIssueSet()
+        self.application.custom_validate(issues, self.context)
+        self.application.store_issues(issues, self.context)
+
+        application = Application.objects.get(pk=self.application.pk)
+        context = CustomValidationContext(application)
+        context.catalog  # warm catalog
+        with self.assertNumQueries(0):
+            cached = application.cached_issues(context)
+        self.assertEqual(list(issues), list(cached))
+
+        # a concurrent change makes the loaded Application outdated
+        data_version = application.data_version
+        self.application.store_issues(CustomValidationIssueSet(),
+                                      self.context,
+                                      data_changed=True)
+        self.assertEqual(data_version + 1, self.application.data_version)
+        self.assertEqual(0, len(self.application.cached_issues(self.context)))
+        application.store_issues(issues, context)
+        self.assertEqual(data_version, application.data_version)
+        application.refresh_from_db()
+        self.assertEqual(0, len(application.cached_issues(context)))
+
+        # a corrupted cache is simply outdated
+        stamp, separator_, serialized_ = (
+                application.validation_cache.partition('\n')
+        )
+        application.validation_cache = stamp + '\n[2,[],[[7,null,null,0]]]'
+        self.assertIsNone(application.cached_issues(context))
+
+    def test_stored_issues_outdated(self):
+        """Changes made outside of the wizard also outdate stored issues"""
+
+        def store_and_reload():
+            issues = CustomValidationIssueSet()
+            self.application.custom_validate(issues)
+            self.application.store_issues(issues, self.context)
+            application = Application.objects.get(pk=self.application.pk)
+            self.assertIsNotNone(application.cached_issues(self.context))
+            return application
+
+        application = store_and_reload()
+        finaid = FinancialAid.objects.create(application=application)
+        application.refresh_from_db()
+        self.assertIsNone(application.cached_issues(self.context))
+
+        self.application.refresh_from_db()
+        application = store_and_reload()
+        finaid = FinancialAid.objects.get(pk=finaid.pk)
+        finaid.provider = 'Changed elsewhere'
+        finaid.save()
+        application.refresh_from_db()
+        self.assertIsNone(application.cached_issues(self.context))
+
+        self.application.refresh_from_db()
+        application = store_and_reload()
+        finaid.delete()
+        application.refresh_from_db()
+        self.assertIsNone(application.cached_issues(self.context))
+
+        self.application.refresh_from_db()
+        application = store_and_reload()
+        Award.objects.latest_version_of('excellence').application_set.add(
+                application
+        )
+        application.refresh_from_db()
+        self.assertIsNone(application.cached_issues(self.context))
+
+        self.application.refresh_from_db()
+        application = store_and_reload()
+        application.phone = '609-412-4321'
+        application.save()
+        self.assertIsNone(application.cached_issues(self.context))
+
+    def test_data_version_saved(self):
+        """Saving increments data_version, which is reloaded only if read"""
+
+        data_version = self.application.data_version
+        with self.assertNumQueries(1):
+            self.application.save()
+        self.assertEqual(data_version + 1, self.application.data_version)
+
+        # a failed save leaves the instance (and the transaction) alone
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                self.application.due_at = None
+                self.application.save()
+        self.assertEqual(data_version + 1, self.application.data_version)
+
+    def test_data_version_deferred(self):
+        """A batch of changes leaves data_version to be incremented once"""
+
+        self.application.refresh_from_db()
+        data_version = self.application.data_version
+        with self.application.deferring_data_version():
+            self.application.award_set.clear()
+            self.application.phone = '609-412-4321'
+            self.application.save()
+            FinancialAid.objects.create(application=self.application)
+            self.application.financialaid_set.all().delete()
+        self.assertFalse(self.application.data_version_deferred)
+        self.application.refresh_from_db()
+        self.assertEqual(data_version, self.application.data_version)
+        self.application.store_issues(CustomValidationIssueSet(),
+                                      self.context,
+                                      data_changed=True)
+        self.assertEqual(data_version + 1, self.application.data_version)
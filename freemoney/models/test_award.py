@@ -6,7 +6,8 @@ from freemoney.models import (ApplicantProfile,
                               Application,
                               CustomValidationIssueSet,
                               Award,
-                              Semester)
+                              Semester,
+                              invalidate_catalog)
 
 
 class AwardApplicationTests(TestCase):
@@ -136,6 +137,102 @@ class AwardApplicationTests(TestCase):
                                             field='major',
                                             code='prohibited')), [])
 
+    def test_sections_needed(self):
+        """Ensure that awards decide which optional sections are needed"""
+
+        self.assertSetEqual(set(),
+                            Award.objects.sections_needed_by(self.application))
+        self.application.award_set.set([
+                Award.objects.latest_version_of('joe_conway')
+        ])
+        self.assertSetEqual({'finaid'},
+                            Award.objects.sections_needed_by(self.application))
+        self.assertFalse(Award.objects.check_app_needs_essay(self.application))
+        self.application.award_set.add(
+                Award.objects.latest_version_of('ean_hong')
+        )
+        self.assertSetEqual({'finaid', 'essay'},
+                            Award.objects.sections_needed_by(self.application))
+
+    def test_sections_needed_by_new_version(self):
+        """Ensure that a new version of an Award needs the same sections"""
+
+        old = Award.objects.latest_version_of('joe_conway')
+        new = Award.objects.create(identifier='joe_conway',
+                                   name=old.name,
+                                   description='Updated description',
+                                   previous_version=old)
+        # (the catalog is replaced only once the new version is committed)
+        invalidate_catalog()
+        self.addCleanup(invalidate_catalog)
+        self.assertTrue(new.needs_finaid)
+        self.assertFalse(new.needs_essay)
+        self.application.award_set.set([new])
+        self.assertSetEqual({'finaid'},
+                            Award.objects.sections_needed_by(self.application))
+
+        custom = Award.objects.create(identifier='custom',
+                                      name='Custom Award',
+                                      description='Needs an essay',
+                                      needs_essay=True)
+        newer = Award.objects.create(identifier='custom',
+                                     name='Custom Award',
+                                     description='Still needs an essay',
+                                     previous_version=custom)
+        self.assertTrue(newer.needs_essay)
+        self.assertFalse(newer.needs_finaid)
+
+    def test_sections_changed_by_new_version(self):
+        """Ensure that a new version of an Award can change its sections"""
+
+        old = Award.objects.latest_version_of('ean_hong')
+        new = Award.objects.create(identifier='ean_hong',
+                                   name=old.name,
+                                   description='No essay anymore',
+                                   needs_essay=False,
+                                   previous_version=old)
+        new.refresh_from_db()
+        self.assertTrue(new.needs_finaid)
+        self.assertFalse(new.needs_essay)
+
+        newer = Award.objects.create(identifier='ean_hong',
+                                     name=old.name,
+                                     description='Nothing extra at all',
+                                     needs_finaid=False,
+                                     previous_version=new)
+        newer.refresh_from_db()
+        self.assertFalse(newer.needs_finaid)
+        self.assertFalse(newer.needs_essay)
+
+    def test_ineligible_selections(self):
+        """Ensure that eligibility can be reported in bulk"""
+
+        senior = Application.objects.create(
+                applicant=self.applicant,
+                due_at=datetime(2016, 11, 15, tzinfo=timezone.utc),
+                semester_graduating=Semester('FA16'),
+                major='Architectural Engineering'
+        )
+        senior.award_set.set([
+                Award.objects.latest_version_of('ean_hong'),
+                Award.objects.latest_version_of('giff_albright')
+        ])
+        self.application.major = 'Electrical Engineering'
+        self.application.save()
+        self.application.award_set.set([
+                Award.objects.latest_version_of('giff_albright'),
+                Award.objects.latest_version_of('daniel_summers')
+        ])
+
+        with self.assertNumQueries(2):
+            report = Award.objects.ineligible_selections(
+                    Application.objects.prefetch_related('award_set')
+            )
+        self.assertEqual({senior: {'ean_hong', 'giff_albright'},
+                          self.application: {'giff_albright'}},
+                         report)
+
+
 class AwardAvailabilityTest(TestCase):
     """Verify that Awards are available, and under the correct circumstances"""
 
@@ -184,3 +281,40 @@ class AwardAvailabilityTest(TestCase):
             award.save()
         with self.assertRaises(ValueError):
             Award.objects.latest_version_of('test')
+
+    def test_latest_award_single_query(self):
+        """The hot-path lookup of the latest version is one query"""
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.new,
+                             Award.objects.latest_version_of('test'))
+
+    def test_latest_award_nonexistent(self):
+        """An unknown identifier has no latest version"""
+
+        self.assertIsNone(Award.objects.latest_version_of('nonexistent'))
+
+    def test_version_chain_with_disjoint_cycle(self):
+        """Only the offline check catches a cycle beside a valid chain"""
+
+        first = Award.objects.create(identifier='test',
+                                     name='Test Award',
+                                     description='Text for a cycle',
+                                     previous_version=None)
+        second = Award.objects.create(identifier='test',
+                                      name='Test Award',
+                                      description='Text for a cycle',
+                                      previous_version=first)
+        first.previous_version = second
+        first.full_clean()
+        first.save()
+
+        self.assertEqual(self.new, Award.objects.latest_version_of('test'))
+        with self.assertRaises(ValueError):
+            Award.objects.check_version_chain('test')
+
+    def test_version_chain_nominal(self):
+        """The offline check agrees with the hot-path lookup"""
+
+        self.assertEqual(Award.objects.latest_version_of('test'),
+                         Award.objects.check_version_chain('test'))
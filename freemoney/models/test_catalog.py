@@ -0,0 +1,114 @@
+from unittest import mock
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
+from freemoney.models import (Award,
+                              EssayPrompt,
+                              Semester,
+                              get_catalog,
+                              invalidate_catalog)
+
+
+class CatalogTests(TestCase):
+    """Verify the process-wide cache of Award and EssayPrompt definitions"""
+
+    def setUp(self):
+        # the catalog outlives each test's transaction, so start (and finish)
+        # every test with a clean slate
+        invalidate_catalog()
+        self.addCleanup(invalidate_catalog)
+
+    def test_built_once(self):
+        """Once built, the catalog is reused without any further queries"""
+
+        get_catalog()
+        with self.assertNumQueries(0):
+            spring_awards = Award.objects.for_semester(Semester('SP17'))
+            ean_hong_prompts = EssayPrompt.objects.for_award('ean_hong')
+        self.assertEqual(8, len(spring_awards))
+        self.assertEqual(2, len(ean_hong_prompts))
+
+    def test_copies_returned(self):
+        """Callers cannot accidentally modify the shared catalog"""
+
+        Award.objects.for_semester(Semester('FA16')).clear()
+        EssayPrompt.objects.for_award('ean_hong')[0].clear()
+        self.assertEqual(3, len(Award.objects.for_semester(Semester('FA16'))))
+        self.assertEqual(2, len(EssayPrompt.objects.for_award('ean_hong')[0]))
+
+    def test_separate_caches(self):
+        """Processes which share no cache agree on the stamp anyway"""
+
+        first_cache = LocMemCache('first', {})
+        second_cache = LocMemCache('second', {})
+        with mock.patch('freemoney.models.catalog.cache', first_cache):
+            first = get_catalog()
+        with mock.patch('freemoney.models.catalog.cache', second_cache):
+            self.assertIs(first, get_catalog())
+
+        # a change (even in place) noticed by the first process...
+        award = Award.objects.get(pk=first.latest_award('excellence').pk)
+        award.description = 'Edited description'
+        award.save()
+        with mock.patch('freemoney.models.catalog.cache', first_cache):
+            invalidate_catalog()
+            second = get_catalog()
+        self.assertNotEqual(first.stamp, second.stamp)
+        self.assertEqual('Edited description',
+                         second.latest_award('excellence').description)
+
+        # ...is noticed by the second once its stamp expires
+        second_cache.clear()
+        with mock.patch('freemoney.models.catalog.cache', second_cache):
+            self.assertIs(second, get_catalog())
+
+
+class CatalogCommitTests(TransactionTestCase):
+    """Verify that changes replace the catalog once they are committed"""
+
+    # restore the Awards and EssayPrompts from the data migrations
+    serialized_rollback = True
+
+    def setUp(self):
+        invalidate_catalog()
+        self.addCleanup(invalidate_catalog)
+
+    def test_invalidated_by_new_version(self):
+        """Saving a new version of an Award replaces the cached version"""
+
+        old = get_catalog().latest_award('excellence')
+        with transaction.atomic():
+            new = Award.objects.create(identifier='excellence',
+                                       name=old.name,
+                                       description='Updated description',
+                                       previous_version=old)
+            self.assertEqual(old, get_catalog().latest_award('excellence'))
+        self.assertEqual(new, get_catalog().latest_award('excellence'))
+        self.assertIn(new, Award.objects.for_semester(Semester('FA16')))
+
+    def test_invalidated_by_deletion(self):
+        """Deleting an EssayPrompt version restores the previous one"""
+
+        old = get_catalog().latest_prompt('giff_visit_review')
+        new = EssayPrompt.objects.create(identifier='giff_visit_review',
+                                         prompt='Updated prompt',
+                                         word_limit=old.word_limit,
+                                         previous_version=old)
+        self.assertEqual([new], EssayPrompt.objects.for_award('giff_albright'))
+        new.delete()
+        self.assertEqual([old], EssayPrompt.objects.for_award('giff_albright'))
+
+    def test_invalidated_by_edit(self):
+        """Editing an EssayPrompt in place replaces the cached version"""
+
+        prompt = EssayPrompt.objects.get(
+                pk=get_catalog().latest_prompt('giff_visit_review').pk
+        )
+        stamp = get_catalog().stamp
+        prompt.word_limit += 100
+        prompt.save()
+        self.assertNotEqual(stamp, get_catalog().stamp)
+        self.assertEqual(prompt.word_limit,
+                         get_catalog().latest_prompt(
+                                 'giff_visit_review'
+                         ).word_limit)
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta, timezone
+from django.test import TestCase, override_settings
+from freemoney.models import (Award,
+                              Semester,
+                              get_current_cycle)
+
+
+class CycleTests(TestCase):
+    """Verify the settings-derived description of the current cycle"""
+
+    def test_spring_cycle(self):
+        """A Spring deadline yields the Spring awards and date bounds"""
+
+        due_at = datetime(2017, 4, 10, 23, 59, 59,
+                          tzinfo=timezone(timedelta(hours=-5)))
+        with override_settings(FREEMONEY_DUE_DATE=due_at):
+            cycle = get_current_cycle()
+            self.assertIs(cycle, get_current_cycle())
+            self.assertEqual(due_at, cycle.due_at)
+            self.assertEqual(Semester('SP17'), cycle.semester)
+            self.assertEqual(8, len(cycle.award_identifiers))
+            self.assertEqual(datetime(2017, 1, 1, tzinfo=due_at.tzinfo),
+                             cycle.starts_at)
+            self.assertEqual(datetime(2017, 6, 1, tzinfo=due_at.tzinfo),
+                             cycle.ends_at)
+
+    def test_due_at_within_cycle(self):
+        """A deadline late on the last day of a Semester is still within it"""
+
+        # i.e., 2017-06-01 04:59:59 UTC
+        due_at = datetime(2017, 5, 31, 23, 59, 59,
+                          tzinfo=timezone(timedelta(hours=-5)))
+        with override_settings(FREEMONEY_DUE_DATE=due_at):
+            cycle = get_current_cycle()
+            self.assertEqual(Semester('SP17'), cycle.semester)
+            self.assertTrue(cycle.starts_at <= due_at < cycle.ends_at)
+
+    def test_reloaded_on_setting_change(self):
+        """Overriding the due date replaces the cached cycle"""
+
+        due_at = datetime(2016, 11, 15, tzinfo=timezone.utc)
+        with override_settings(FREEMONEY_DUE_DATE=due_at):
+            cycle = get_current_cycle()
+            self.assertEqual(Semester('FA16'), cycle.semester)
+            self.assertEqual(('ean_hong', 'excellence', 'pledge'),
+                             cycle.award_identifiers)
+            self.assertEqual(datetime(2017, 1, 1, tzinfo=timezone.utc),
+                             cycle.ends_at)
+            self.assertEqual(cycle.award_identifiers,
+                             tuple(award.identifier for award
+                                   in Award.objects.for_semester()))
+        self.assertIsNot(cycle, get_current_cycle())
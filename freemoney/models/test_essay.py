@@ -61,6 +61,58 @@ class EssayPromptTests(TestCase):
         first_iter = iter(found_issues)
         self.assertNotEqual(next(first_iter).subfield, None)
 
+    def test_responses_loaded_with_prompts(self):
+        """Verify that essay validation does not look up each prompt"""
+        self.application.semester_initiated = Semester('FA16')
+        self.application.full_clean()
+        self.application.save()
+        self.application.award_set.add(
+                Award.objects.latest_version_of('ean_hong')
+        )
+        for prompt_or_subset in EssayPrompt.objects.for_application(
+                self.application):
+            if isinstance(prompt_or_subset, EssayPrompt):
+                prompt_or_subset = [prompt_or_subset]
+            for prompt in prompt_or_subset:
+                Essay.objects.create(application=self.application,
+                                     prompt=prompt,
+                                     response='Short and sweet')
+
+        issues = CustomValidationIssueSet()
+        # one query for the awards, and one for the essays with prompts
+        with self.assertNumQueries(2):
+            EssayPrompt.objects.custom_validate_for_application(
+                    self.application,
+                    issues
+            )
+        self.assertEqual(0, len(issues))
+
+    def test_for_application_memoized(self):
+        """Verify that shared prompts are listed once, and results reused"""
+        self.application.semester_initiated = Semester('FA16')
+        self.application.full_clean()
+        self.application.save()
+        self.application.award_set.set([
+                Award.objects.latest_version_of('ambassador'),
+                Award.objects.latest_version_of('ean_hong')
+        ])
+
+        first = EssayPrompt.objects.for_application(self.application)
+        identifiers = []
+        for prompt_or_subset in first:
+            if isinstance(prompt_or_subset, EssayPrompt):
+                prompt_or_subset = [prompt_or_subset]
+            identifiers.extend(x.identifier for x in prompt_or_subset)
+        self.assertEqual(len(identifiers), len(set(identifiers)))
+        self.assertIn('newmember_involvement_previous', identifiers)
+        self.assertNotIn('established_involvement_outside', identifiers)
+
+        first.clear()
+        # only the Application's awards are looked up again
+        with self.assertNumQueries(1):
+            second = EssayPrompt.objects.for_application(self.application)
+        self.assertNotEqual([], second)
+
 
 class EssayPromptAvailabilityTests(TestCase):
     """Verify that EssayPrompts are available under specific circumstances"""
@@ -116,3 +168,25 @@ class EssayPromptAvailabilityTests(TestCase):
             essay.save()
         with self.assertRaises(ValueError):
             EssayPrompt.objects.latest_version_of('test')
+
+    def test_latest_essay_prompts_in_bulk(self):
+        """Resolve several identifiers to their latest versions at once"""
+
+        other = EssayPrompt.objects.create(
+                identifier='other',
+                prompt='This is another test!',
+                word_limit=500,
+                previous_version=None
+        )
+        with self.assertNumQueries(1):
+            latest = EssayPrompt.objects.latest_versions_of(['test',
+                                                             'other'])
+        self.assertDictEqual({'test': self.new, 'other': other}, latest)
+
+    def test_essay_prompt_history(self):
+        """The full history of a prompt is listed from oldest to newest"""
+
+        self.assertListEqual([self.old, self.mid, self.new],
+                             EssayPrompt.objects.version_history('test'))
+        self.assertListEqual([],
+                             EssayPrompt.objects.version_history('nothing'))
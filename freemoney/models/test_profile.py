@@ -1,8 +1,9 @@
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.exceptions import MultipleObjectsReturned
-from django.test import TestCase
+from django.db import transaction
+from django.test import TestCase, override_settings
 from freemoney.models import (ApplicantProfile,
                               Application,
                               Semester)
@@ -53,6 +54,45 @@ class ApplicantProfileAvailabilityTests(TestCase):
                          )
         )
 
+    def test_current_application_end_of_semester(self):
+        """A deadline on the last day of a Semester (in EST) is current"""
+
+        due_at = datetime(2017, 5, 31, 23, 59, 59,
+                          tzinfo=timezone(timedelta(hours=-5)))
+        application = Application.objects.create(
+                applicant=self.old_applicant,
+                due_at=due_at
+        )
+        with override_settings(FREEMONEY_DUE_DATE=due_at):
+            applicant = ApplicantProfile.objects.get(pk=self.old_applicant.pk)
+            self.assertEqual(application, applicant.current_application)
+            self.assertIn(applicant,
+                          ApplicantProfile.objects.active_profiles())
+
+    def test_current_application_cached(self):
+        """Verify that the Application is looked up once per profile object"""
+
+        # one query for the Application, plus one per kind of related record
+        with self.assertNumQueries(4):
+            first = self.new_old_applicant.current_application
+            second = self.new_old_applicant.current_application
+        self.assertIs(first, second)
+        del self.new_old_applicant.current_application
+        with self.assertNumQueries(4):
+            self.assertEqual(first,
+                             self.new_old_applicant.current_application)
+
+    def test_lock_current_application(self):
+        """Verify that locking reloads the Application afterward"""
+
+        stale = self.new_old_applicant.current_application
+        Application.objects.filter(pk=stale.pk).update(phone='5551234')
+        with transaction.atomic():
+            self.new_old_applicant.lock_current_application()
+            fresh = self.new_old_applicant.current_application
+        self.assertEqual(stale, fresh)
+        self.assertEqual('5551234', fresh.phone)
+
     def test_no_current_application(self):
         """Verify that no Application is found, correctly"""
 
@@ -87,9 +127,13 @@ class ApplicantProfileAvailabilityTests(TestCase):
 
         found_profiles = ApplicantProfile.objects.active_profiles()
         found_names = []
-        for profile in found_profiles:
-            found_name = profile.user.username
-            found_name = found_name.replace('@example.com', '')
-            found_names.append(found_name)
+        with self.assertNumQueries(1):
+            for profile in found_profiles:
+                found_name = profile.user.username
+                found_name = found_name.replace('@example.com', '')
+                found_names.append(found_name)
         self.assertSetEqual(set(found_names),
                             set(['Alice', 'Daniel']))
+        self.assertEqual(1, found_profiles.filter(
+                user__username='Daniel@example.com'
+        ).count())
@@ -1,4 +1,6 @@
+import copy
 import datetime
+import pickle
 from django.test import TestCase
 from freemoney.models import Semester
 
@@ -89,3 +91,21 @@ class SemesterTestCase(TestCase):
         self.assertLess(Semester('Spring 2010'), Semester('FA10'))
         self.assertLess(Semester('FA10'), Semester(('Fall', 2011)))
         self.assertLess(Semester(('Fall', 2011)), Semester('Spring 2013'))
+
+    def test_interning(self):
+        """Check that equal Semesters are shared, hashable, and picklable"""
+        a = Semester('FA16')
+        self.assertIs(a, Semester(('fall', 2016)))
+        self.assertIs(a, Semester(datetime.date(2016, 12, 25)))
+        self.assertIs(a, pickle.loads(pickle.dumps(a)))
+        self.assertIs(a, copy.deepcopy(a))
+        self.assertEqual(1, len({a, Semester('Fall 2016')}))
+        self.assertEqual(2016*2 + 1, a.ordinal)
+        self.assertEqual(('Fall', 2016), a.semester_tuple)
+        self.assertEqual('Fall 2016', str(a))
+        self.assertTrue(a.is_fall)
+        self.assertFalse(a.is_spring)
+        with self.assertRaises(AttributeError):
+            a._ordinal = 0
+        with self.assertRaises(TypeError):
+            a < datetime.date(2016, 9, 1)
@@ -1,3 +1,4 @@
+import pickle
 from django.test import TestCase
 from freemoney.models import (CustomValidationIssue,
                               CustomValidationIssueSet)
@@ -95,3 +96,204 @@ class CustomValidationTestCase(TestCase):
             issues.search(section='grandparent',
                           field=CustomValidationIssueSet.GLOBAL,
                           subfield=4)
+
+    def test_issue_values(self):
+        """Issues are immutable, hashable, and identified without extra"""
+
+        first = CustomValidationIssue(section='s', field='f', subfield=1,
+                                      code='invalid', extra='first')
+        second = CustomValidationIssue(section='s', field='f', subfield=1,
+                                       code='invalid', extra='second')
+        self.assertEqual(first, second)
+        self.assertEqual(hash(first), hash(second))
+        self.assertEqual(1, len(set([first, second])))
+        with self.assertRaises(AttributeError):
+            first.code = 'required'
+        self.assertEqual(first.extra, pickle.loads(pickle.dumps(first)).extra)
+
+    def test_membership(self):
+        """The set keeps the first of several equal issues, in order"""
+
+        issues = CustomValidationIssueSet()
+        issues.create(section='b', code='invalid', extra='kept')
+        issues.create(section='a', code='invalid')
+        issues.create(section='b', code='invalid', extra='dropped')
+        self.assertEqual(2, len(issues))
+        self.assertEqual(['b', 'a'], [issue.section for issue in issues])
+        self.assertEqual('kept', next(iter(issues)).extra)
+        self.assertIn(CustomValidationIssue(section='a', code='invalid'),
+                      issues)
+
+        issues.discard(CustomValidationIssue(section='b', code='invalid'))
+        self.assertEqual(['a'], [issue.section for issue in issues])
+        issues.discard(CustomValidationIssue(section='b', code='invalid'))
+        self.assertEqual(1, len(issues))
+
+    def test_indexed_search(self):
+        """Indexed searches match a brute-force scan, in insertion order"""
+
+        GLOBAL = CustomValidationIssueSet.GLOBAL
+        specifications = [(None, None, None),
+                          ('s1', None, None),
+                          ('s1', 'f1', None),
+                          ('s1', 'f1', 1),
+                          ('s1', 'f1', 2),
+                          ('s1', 'f2', 1),
+                          ('s2', None, None),
+                          ('s2', 'f1', None),
+                          ('s2', 'f1', 1)]
+        issues = CustomValidationIssueSet()
+        for code in ['invalid', 'required']:
+            for section, field, subfield in reversed(specifications):
+                issues.create(section=section, field=field,
+                              subfield=subfield, code=code)
+
+        def brute_force(section, field, subfield, code):
+            matches = []
+            for issue in issues:
+                for wanted, actual in [(section, issue.section),
+                                       (field, issue.field),
+                                       (subfield, issue.subfield),
+                                       (code, issue.code)]:
+                    if wanted is None:
+                        continue
+                    elif wanted == GLOBAL and actual is not None:
+                        break
+                    elif wanted != GLOBAL and wanted != actual:
+                        break
+                else:
+                    matches.append(issue)
+            return matches
+
+        searches = [(None, None, None), (GLOBAL, None, None),
+                    (GLOBAL, GLOBAL, None), (GLOBAL, GLOBAL, GLOBAL),
+                    ('s1', None, None), ('s1', GLOBAL, None),
+                    ('s1', GLOBAL, GLOBAL), ('s1', 'f1', None),
+                    ('s1', 'f1', GLOBAL), ('s1', 'f1', 1), ('s2', 'f2', 1),
+                    ('s3', None, None)]
+        for section, field, subfield in searches:
+            for code in [None, 'invalid', 'required', 'prohibited']:
+                expected = brute_force(section, field, subfield, code)
+                found = issues.search(section=section, field=field,
+                                      subfield=subfield, code=code)
+                self.assertEqual([x.key for x in expected],
+                                 [x.key for x in found])
+                view = issues.search(section=section, field=field,
+                                     subfield=subfield, code=code, lazy=True)
+                self.assertEqual(expected, list(view))
+                self.assertEqual(len(expected), len(view))
+                self.assertEqual(len(expected), issues.count(
+                        section=section, field=field,
+                        subfield=subfield, code=code
+                ))
+                self.assertEqual(len(expected) > 0, issues.any_in(
+                        section=section, field=field,
+                        subfield=subfield, code=code
+                ))
+                for issue in issues:
+                    self.assertEqual(issue in expected, issue in view)
+
+        before = len(issues)
+        removed = issues.search(section='s1', field='f1', discard=True)
+        self.assertEqual(before - len(removed), len(issues))
+        self.assertEqual(0, len(issues.search(section='s1', field='f1')))
+        self.assertEqual(2, len(issues.search(section='s1', field='f2')))
+        for issue in removed:
+            self.assertNotIn(issue, issues)
+        issues.add(next(iter(removed)))
+        self.assertEqual(1, len(issues.search(section='s1', field='f1')))
+
+    def test_lazy_search(self):
+        """Lazy views copy nothing, and so reflect later changes to the Set"""
+
+        issues = CustomValidationIssueSet()
+        view = issues.search(section='s1', lazy=True)
+        self.assertFalse(view)
+        self.assertFalse(issues.any_in(section='s1'))
+        issues.create(section='s1', field='f1', code='invalid')
+        issues.create(section='s2', field='f1', code='invalid')
+        self.assertTrue(view)
+        self.assertEqual(1, len(view))
+        self.assertTrue(issues.any_in(section='s1'))
+        self.assertEqual(2, issues.count(code='invalid'))
+        self.assertEqual(0, issues.count(section='s1', code='required'))
+        with self.assertRaises(ValueError):
+            issues.search(section='s1', lazy=True, discard=True)
+        with self.assertRaises(ValueError):
+            issues.any_in(field='f1')
+        with self.assertRaises(KeyError):
+            issues.count(code='bogus')
+
+    def test_lazy_search_operators(self):
+        """Set operators on a view return a new (plain) Set"""
+
+        issues = CustomValidationIssueSet()
+        issues.create(section='s1', field='f1', code='invalid')
+        issues.create(section='s1', field='f2', code='required')
+        issues.create(section='s2', field='f1', code='invalid')
+        in_s1 = issues.search(section='s1', lazy=True)
+        invalid = issues.search(code='invalid', lazy=True)
+
+        both = in_s1 & invalid
+        self.assertIsInstance(both, CustomValidationIssueSet)
+        self.assertEqual([('s1', 'f1', None, 'invalid')],
+                         [x.key for x in both])
+        self.assertEqual(3, len(in_s1 | invalid))
+        self.assertEqual([('s1', 'f2', None, 'required')],
+                         [x.key for x in in_s1 - invalid])
+
+    def test_json(self):
+        """A Set survives a round trip through JSON, extras and all"""
+
+        issues = CustomValidationIssueSet()
+        issues.create(section='s', field='f', subfield=2, code='invalid',
+                      extra={'limit': [1, 2]})
+        issues.create(code='required')
+        issues.create(section='s', code='prohibited', extra='why')
+        issues.create(section='t', field='s', code='invalid', extra=0)
+        serialized = issues.to_json()
+        self.assertEqual('[2,["s","f","t"],'
+                         '[[0,1,2,1,{"dict":{"limit":[1,2]}}],'
+                         '[null,null,null,0],[0,null,null,4,"why"],'
+                         '[2,0,null,1,0]]]', serialized)
+        rebuilt = CustomValidationIssueSet.from_json(serialized)
+        self.assertEqual(list(issues), list(rebuilt))
+        self.assertEqual([x.extra for x in issues],
+                         [x.extra for x in rebuilt])
+
+        with self.assertRaises(ValueError):
+            CustomValidationIssueSet.from_json('[[null,null,null,"invalid"]]')
+        with self.assertRaises(ValueError):
+            CustomValidationIssueSet.from_json('[0,[],[]]')
+        for malformed_row in ['[5,null,null,0]',
+                              '[null,null,null,999]',
+                              '[null,null,null,"invalid"]',
+                              '[null,null,null,0,{"set":[1]}]',
+                              '[null,null,null,0,{"tuple":1}]',
+                              '[null,null,null,0,{"dict":1}]',
+                              '[null,null,null]',
+                              '0']:
+            with self.assertRaises(ValueError):
+                CustomValidationIssueSet.from_json(
+                        '[2,["s"],[{}]]'.format(malformed_row)
+                )
+
+    def test_json_extras(self):
+        """Extras keep their types through JSON, or are refused up front"""
+
+        extras = [(1, 2),
+                  {'tuple': (3, [4, (5,)]), 'dict': {}},
+                  [(), {'nested': ('a', None, True, 1.5)}]]
+        issues = CustomValidationIssueSet()
+        for subfield, extra in enumerate(extras):
+            issues.create(section='s', field='f', subfield=subfield,
+                          code='invalid', extra=extra)
+        rebuilt = CustomValidationIssueSet.from_json(issues.to_json())
+        self.assertEqual(extras, [x.extra for x in rebuilt])
+        self.assertEqual([type(x) for x in extras],
+                         [type(x.extra) for x in rebuilt])
+        self.assertEqual(tuple, type(list(rebuilt)[1].extra['tuple']))
+
+        for bad_extra in [object(), {1, 2}, {1: 'int key'}, [b'bytes']]:
+            with self.assertRaises(TypeError):
+                issues.create(section='s', code='invalid', extra=bad_extra)
@@ -1,4 +1,7 @@
+import collections
 import collections.abc
+import freemoney.models
+import json
 
 
 class CustomValidationIssue:
@@ -15,91 +18,306 @@ class CustomValidationIssue:
 
     Section and field are strings or None. Subfield is an integer or None.
     Code is a string which matches a member of CODES (see below). The extra
-    field 'extra' can be any value with meaning for the code. Please note: two
+    field 'extra' can be any value with meaning for the code, built from None,
+    bool, int, float, str, list, tuple, and dict (with str keys) so that it
+    can be serialized (see CustomValidationIssueSet.to_json). Please note: two
     Issues are the same even if their extra values differ!
+
+    Issues are immutable (and hashable) values. The attribute 'key' holds the
+    (section, field, subfield, code) tuple which identifies an issue.
     """
 
-    # Well-known code values (and the only ones allowed!)
+    # Well-known code values (and the only ones allowed!); serialized issues
+    # refer to codes by position, so new codes must be added at the end
     CODES = ['required',   # information is missing that shouldn't be
              'invalid',    # input is malformed in some way
              'min-length', 'max-length', # too few or too many
              'prohibited'] # a business rule prevents some action
 
+    __slots__ = ('section', 'field', 'subfield', 'code', 'extra', 'key')
+
     def __init__(self, **kwargs):
-        self.section = kwargs.pop('section', None)
-        self.field = kwargs.pop('field', None)
-        self.subfield = kwargs.pop('subfield', None)
-        self.code = kwargs.pop('code')
-        self.extra = kwargs.pop('extra', None)
+        section = kwargs.pop('section', None)
+        field = kwargs.pop('field', None)
+        subfield = kwargs.pop('subfield', None)
+        code = kwargs.pop('code')
+        extra = kwargs.pop('extra', None)
         if len(kwargs) > 0:
             raise KeyError('illegal / invalid issue data: ' +
                             ', '.join(kwargs.keys()))
-        elif not (isinstance(self.section, (str, type(None))) and
-                  isinstance(self.field, (str, type(None))) and
-                  isinstance(self.subfield, (int, type(None))) and
-                  isinstance(self.code, str)):
+        elif not (isinstance(section, (str, type(None))) and
+                  isinstance(field, (str, type(None))) and
+                  isinstance(subfield, (int, type(None))) and
+                  isinstance(code, str)):
             raise TypeError('incorrect type or types provided for issue')
-        elif self.code not in CustomValidationIssue.CODES:
-            raise KeyError('unknown code provided: {}'.format(self.code))
+        elif code not in CustomValidationIssue.CODES:
+            raise KeyError('unknown code provided: {}'.format(code))
         else:
             hierarchy_finished = False
-            for level_attr in ['section', 'field', 'subfield']:
-                if getattr(self, level_attr) == None:
+            for level_attr, value in [('section', section),
+                                      ('field', field),
+                                      ('subfield', subfield)]:
+                if value == None:
                     hierarchy_finished = True
                 else:
                     if hierarchy_finished:
                         raise ValueError('illegal issue hierarchy at ' +
                                          level_attr)
+        if extra is not None:
+            # raise any TypeError now, rather than when serializing
+            _encode_extra(extra)
+
+        # Issues are immutable, so bypass __setattr__ (just this once)
+        object.__setattr__(self, 'section', section)
+        object.__setattr__(self, 'field', field)
+        object.__setattr__(self, 'subfield', subfield)
+        object.__setattr__(self, 'code', code)
+        object.__setattr__(self, 'extra', extra)
+        # the identity of an issue, which (deliberately) excludes extra
+        object.__setattr__(self, 'key', (section, field, subfield, code))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('CustomValidationIssue is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('CustomValidationIssue is immutable')
+
+    def __reduce__(self):
+        return (_rebuild_issue, (self.section, self.field, self.subfield,
+                                 self.code, self.extra))
 
     def __eq__(self, other):
         if isinstance(other, CustomValidationIssue):
-            return (self.section == other.section and
-                    self.field == other.field and
-                    self.subfield == other.subfield and
-                    self.code == other.code)
+            return self.key == other.key
         else:
             return False
 
+    def __hash__(self):
+        return hash(self.key)
+
     def __str__(self):
         return str((self.section, self.field, self.subfield,
                     self.code, self.extra))
 
 
+def _rebuild_issue(section, field, subfield, code, extra):
+    return CustomValidationIssue(section=section, field=field,
+                                 subfield=subfield, code=code, extra=extra)
+
+
+def _encode_extra(value):
+    """Return the JSON form of an extra value, which tags tuples and dicts"""
+
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    elif isinstance(value, list):
+        return [_encode_extra(item) for item in value]
+    elif isinstance(value, tuple):
+        return {'tuple': [_encode_extra(item) for item in value]}
+    elif isinstance(value, dict):
+        if not all(isinstance(key, str) for key in value.keys()):
+            raise TypeError('extra dict keys must be strings')
+        return {'dict': {key: _encode_extra(item)
+                         for key, item in value.items()}}
+    else:
+        raise TypeError('unsupported type for extra: {}'.format(
+                type(value).__name__
+        ))
+
+
+def _decode_extra(value):
+    """Reverse _encode_extra"""
+
+    if isinstance(value, list):
+        return [_decode_extra(item) for item in value]
+    elif isinstance(value, dict):
+        if 'tuple' in value:
+            return tuple(_decode_extra(item) for item in value['tuple'])
+        else:
+            return {key: _decode_extra(item)
+                    for key, item in value['dict'].items()}
+    else:
+        return value
+
+
+# code -> position in CODES (see CustomValidationIssueSet.to_json)
+_CODE_POSITIONS = {code: position for position, code
+                   in enumerate(CustomValidationIssue.CODES)}
+
+
 class CustomValidationIssueSet(collections.abc.MutableSet):
     """Set of CollectionValidationIssues with search and manipulation utils"""
 
     # see the search function
     GLOBAL = '__GLOBAL_reserved__'
 
+    # version of the format produced by to_json
+    JSON_FORMAT = 2
+
     def __init__(self):
-        # not a set because CustomValidationIssue is not hashable
-        self._collection = []
+        # issue key -> issue, so that the first issue added (along with its
+        # extra value) is kept, and in the order in which it was added
+        self._collection = collections.OrderedDict()
+        # issue key -> insertion counter, to order the results of searches
+        self._sequence = {}
+        self._counter = 0
+        # section -> field -> subfield -> code -> issue key
+        self._index = {}
+        # code -> set of issue keys (for searches which don't use _index)
+        self._code_index = {}
 
     def __contains__(self, item):
         if isinstance(item, CustomValidationIssue):
-            for issue in self._collection:
-                if issue == item:
-                    return True
+            return item.key in self._collection
         return False
 
     def __iter__(self):
-        return iter(self._collection)
+        return iter(self._collection.values())
 
     def __len__(self):
         return len(self._collection)
 
     def add(self, new_issue):
         if isinstance(new_issue, CustomValidationIssue):
-            if new_issue not in self:
-                self._collection.append(new_issue)
+            key = new_issue.key
+            if key not in self._collection:
+                self._collection[key] = new_issue
+                self._sequence[key] = self._counter
+                self._counter += 1
+                section, field, subfield, code = key
+                level = self._index.setdefault(section, {})
+                level = level.setdefault(field, {})
+                level = level.setdefault(subfield, {})
+                level[code] = key
+                self._code_index.setdefault(code, set()).add(key)
         else:
             raise TypeError('can only add CustomValidationIssue instances')
 
     def discard(self, del_issue):
-        for i in range(len(self._collection)):
-            if self._collection[i] == del_issue:
-                del self._collection[i]
+        if isinstance(del_issue, CustomValidationIssue):
+            if del_issue.key in self._collection:
+                self._remove(del_issue.key)
+
+    def _remove(self, key):
+        del self._collection[key]
+        del self._sequence[key]
+        section, field, subfield, code = key
+        # prune the emptied branches, so that searches never visit them
+        path = [self._index]
+        path.append(path[-1][section])
+        path.append(path[-1][field])
+        path.append(path[-1][subfield])
+        for level, value in zip(reversed(path), [code, subfield,
+                                                 field, section]):
+            del level[value]
+            if len(level) > 0:
                 break
+        self._code_index[code].discard(key)
+        if len(self._code_index[code]) == 0:
+            del self._code_index[code]
+
+    def _iter_search_keys(self, section, field, subfield, code):
+        """Generate keys of the matching issues (in no particular order)"""
+
+        if section is None:
+            # per the hierarchy rules, field and subfield are None, too
+            if code is None:
+                yield from self._collection.keys()
+            else:
+                yield from self._code_index.get(code, ())
+            return
+
+        levels = [self._index]
+        for value in [section, field, subfield]:
+            if value is None:
+                levels = [child for level in levels
+                                for child in level.values()]
+            else:
+                if value == CustomValidationIssueSet.GLOBAL:
+                    value = None
+                levels = [level[value] for level in levels if value in level]
+
+        for level in levels:
+            if code is None:
+                yield from level.values()
+            elif code in level:
+                yield level[code]
+
+    def _search_keys(self, section, field, subfield, code):
+        """List the keys of the matching issues, in insertion order"""
+
+        keys = list(self._iter_search_keys(section, field, subfield, code))
+        keys.sort(key=self._sequence.__getitem__)
+        return keys
+
+    def to_json(self):
+        """Serialize the issues (and their extras) to a compact JSON string
+
+        The result is [JSON_FORMAT, names, rows]. Each distinct section or
+        field name appears in names just once, and each issue (in order) is a
+        row: [section, field, subfield, code] or, if it has an extra value,
+        [section, field, subfield, code, extra]. The section and field are
+        positions in names (or null), and the code is a position in
+        CustomValidationIssue.CODES.
+
+        Extra values are JSON values, except that a tuple is written as
+        {"tuple": [...]} and a dict as {"dict": {...}}, so that both survive
+        the round trip unchanged.
+        """
+
+        positions = {}
+        names = []
+        def intern(name):
+            if name is None:
+                return None
+            position = positions.get(name)
+            if position is None:
+                position = positions[name] = len(names)
+                names.append(name)
+            return position
+
+        rows = []
+        for issue in self._collection.values():
+            row = [intern(issue.section),
+                   intern(issue.field),
+                   issue.subfield,
+                   _CODE_POSITIONS[issue.code]]
+            if issue.extra is not None:
+                row.append(_encode_extra(issue.extra))
+            rows.append(row)
+        return json.dumps([CustomValidationIssueSet.JSON_FORMAT, names, rows],
+                          separators=(',', ':'))
+
+    @classmethod
+    def from_json(cls, serialized):
+        """Rebuild a Set, in the same order, from the result of to_json
+
+        Raises a ValueError if serialized is not in the current JSON_FORMAT,
+        or is malformed in any way.
+        """
+
+        try:
+            json_format, names, rows = json.loads(serialized)
+        except (TypeError, ValueError):
+            raise ValueError('not a serialized CustomValidationIssueSet')
+        if json_format != CustomValidationIssueSet.JSON_FORMAT:
+            raise ValueError('unsupported format: {}'.format(json_format))
+
+        codes = CustomValidationIssue.CODES
+        issues = cls()
+        try:
+            for row in rows:
+                section, field, subfield, code = row[:4]
+                issues.add(CustomValidationIssue(
+                        section=None if section is None else names[section],
+                        field=None if field is None else names[field],
+                        subfield=subfield,
+                        code=codes[code],
+                        extra=_decode_extra(row[4]) if len(row) > 4 else None
+                ))
+        except (AttributeError, IndexError, KeyError, TypeError) as error:
+            raise ValueError('malformed issue: {!r}'.format(error))
+        return issues
 
     def create(self, section=None, field=None, subfield=None,
                      code=None, extra=None):
@@ -110,30 +328,9 @@ class CustomValidationIssueSet(collections.abc.MutableSet):
                                           extra=extra)
         self.add(new_issue)
 
-    def search(self, *, section=None,
-                        field=None,
-                        subfield=None,
-                        code=None,
-                        aggregate=False,
-                        discard=False):
-        """Search issues, returning a new set with those matching the critera.
-
-        The default value for the filter arguments is None, which matches any
-        value. This is different than the constructor's behavior, which treats
-        None as a "global" specifier for section, field, or subfield. To match
-        a literal None, pass the value of the special attribute GLOBAL.
-
-        When either None or GLOBAL values are used, the usual hierarchy rules
-        apply (e.g., no meaningless searches for subfield without field).
-
-        If the specification of section, field, and subfield will only match
-        one target, you can pass aggregate=True to get a simple list of codes
-        rather than a new CustomValidationIssueSet. Note: if more than one
-        target was matched after all, an exception will be raised.
-
-        If the discard=True flag is passed, any returned Issues will be
-        deleted from the Set.
-        """
+    @staticmethod
+    def _check_criteria(section, field, subfield, code):
+        """Raise an exception for malformed search criteria"""
 
         if not (isinstance(section, (str, type(None))) and
                 isinstance(field, (str, type(None))) and
@@ -163,37 +360,73 @@ class CustomValidationIssueSet(collections.abc.MutableSet):
                     if had_none or had_global:
                         raise ValueError('illegal issue hierarchy at '+level)
 
-            matches = []
-            new_collection = []
-            for issue in self._collection:
-                new_collection.append(issue)
-                if section is not None:
-                    if section == CustomValidationIssueSet.GLOBAL:
-                        if None != issue.section:
-                            continue
-                    else:
-                        if section != issue.section:
-                            continue
-                if field is not None:
-                    if field == CustomValidationIssueSet.GLOBAL:
-                        if None != issue.field:
-                            continue
-                    else:
-                        if field != issue.field:
-                            continue
-                if subfield is not None:
-                    if subfield == CustomValidationIssueSet.GLOBAL:
-                        if None != issue.subfield:
-                            continue
-                    else:
-                        if subfield != issue.subfield:
-                            continue
-                if code is not None and code != issue.code:
-                    continue
-                matches.append(issue)
-                if discard:
-                    new_collection.pop()
-            self._collection = new_collection
+    def any_in(self, *, section=None, field=None, subfield=None, code=None):
+        """True if any issue matches the criteria (as for search)"""
+
+        CustomValidationIssueSet._check_criteria(section, field,
+                                                 subfield, code)
+        for key_ in self._iter_search_keys(section, field, subfield, code):
+            return True
+        return False
+
+    def count(self, *, section=None, field=None, subfield=None, code=None):
+        """Count the issues matching the criteria (as for search)"""
+
+        CustomValidationIssueSet._check_criteria(section, field,
+                                                 subfield, code)
+        count = 0
+        for key_ in self._iter_search_keys(section, field, subfield, code):
+            count += 1
+        return count
+
+    def search(self, *, section=None,
+                        field=None,
+                        subfield=None,
+                        code=None,
+                        aggregate=False,
+                        discard=False,
+                        lazy=False):
+        """Search issues, returning a new set with those matching the critera.
+
+        The default value for the filter arguments is None, which matches any
+        value. This is different than the constructor's behavior, which treats
+        None as a "global" specifier for section, field, or subfield. To match
+        a literal None, pass the value of the special attribute GLOBAL.
+
+        When either None or GLOBAL values are used, the usual hierarchy rules
+        apply (e.g., no meaningless searches for subfield without field).
+
+        If the specification of section, field, and subfield will only match
+        one target, you can pass aggregate=True to get a simple list of codes
+        rather than a new CustomValidationIssueSet. Note: if more than one
+        target was matched after all, an exception will be raised.
+
+        If the discard=True flag is passed, any returned Issues will be
+        deleted from the Set.
+
+        If the lazy=True flag is passed, a CustomValidationIssueView is
+        returned instead of a new Set. Nothing is copied; the view searches
+        this Set whenever it is used. For simple checks, any_in and count are
+        cheaper still.
+
+        Searches use an index, so their cost is proportional to the number of
+        matching issues rather than to the size of the Set.
+        """
+
+        if lazy and (aggregate or discard):
+            raise ValueError('a lazy search cannot aggregate or discard')
+        CustomValidationIssueSet._check_criteria(section, field,
+                                                 subfield, code)
+
+        if lazy:
+            return CustomValidationIssueView(self, section, field,
+                                             subfield, code)
+        else:
+            keys = self._search_keys(section, field, subfield, code)
+            matches = [self._collection[key] for key in keys]
+            if discard:
+                for key in keys:
+                    self._remove(key)
 
             if aggregate:
                 aggregate_specification = None
@@ -212,3 +445,127 @@ class CustomValidationIssueSet(collections.abc.MutableSet):
                 for issue in matches:
                     newset.add(issue)
                 return newset
+
+
+class CustomValidationIssueView(collections.abc.Set):
+    """Read-only, live view of the issues in a Set which match a search
+
+    Views are returned by CustomValidationIssueSet.search(lazy=True). They
+    can be iterated, sized, and tested for truth or membership, but they do
+    not copy anything: every use searches the underlying Set afresh. The set
+    operators (&, |, -, ^) return a new CustomValidationIssueSet.
+    """
+
+    def __init__(self, issue_set, section, field, subfield, code):
+        self._issue_set = issue_set
+        self._criteria = (section, field, subfield, code)
+
+    def __contains__(self, item):
+        if item not in self._issue_set:
+            return False
+        for wanted, actual in zip(self._criteria, item.key):
+            if wanted is None:
+                continue
+            elif wanted == CustomValidationIssueSet.GLOBAL:
+                wanted = None
+            if wanted != actual:
+                return False
+        return True
+
+    def __iter__(self):
+        for key in self._issue_set._search_keys(*self._criteria):
+            yield self._issue_set._collection[key]
+
+    def __len__(self):
+        return self._issue_set.count(**self._criteria_kwargs())
+
+    def __bool__(self):
+        return self._issue_set.any_in(**self._criteria_kwargs())
+
+    @classmethod
+    def _from_iterable(cls, iterable):
+        # results of set operators (e.g., view & other) are new, plain Sets
+        issues = CustomValidationIssueSet()
+        for issue in iterable:
+            issues.add(issue)
+        return issues
+
+    def _criteria_kwargs(self):
+        return dict(zip(['section', 'field', 'subfield', 'code'],
+                        self._criteria))
+
+
+class CustomValidationContext:
+    """Request-scoped cache for the lookups made during custom validation.
+
+    Validating an Application fans out into queries for its awards, essays,
+    and financial aid records. A context remembers those lookups, as well as
+    the issues found by each section's validator, so that validating the
+    same Application twice (e.g., before and after saving a wizard page)
+    repeats only the work which is actually necessary.
+
+    Related records are read from the Application's prefetch cache, if it has
+    one (see Application.related_records), so an Application loaded with
+    Application.objects.prefetched() is validated without further queries.
+
+    Whenever the data underlying a section (or an individual Application
+    field) changes, call invalidate with its name. Any cached lookups for the
+    data are discarded (including prefetched records), along with the
+    results of every validator which depends upon it (see
+    Application.sections_affected_by).
+    """
+
+    def __init__(self, application):
+        self.application = application
+        self._lookups = {}
+        self._results = {}
+
+    def _lookup(self, section, loader):
+        if section not in self._lookups:
+            self._lookups[section] = loader()
+        return self._lookups[section]
+
+    def _related(self, section):
+        return self._lookup(section,
+                            lambda: self.application.related_records(section))
+
+    @property
+    def awards(self):
+        """List of the Awards selected by the Application"""
+        return self._related('award')
+
+    @property
+    def essays(self):
+        """List of the Application's Essays (with their EssayPrompts)"""
+        return self._related('essay')
+
+    @property
+    def financial_aids(self):
+        """List of the Application's FinancialAid records"""
+        return self._related('finaid')
+
+    @property
+    def catalog(self):
+        """The Catalog in effect for the duration of this context"""
+        return self._lookup('catalog', freemoney.models.get_catalog)
+
+    def validate(self, section, validator, issues):
+        """Add the issues found by validator(issue_set), memoized by section"""
+
+        if section not in self._results:
+            found = CustomValidationIssueSet()
+            validator(found)
+            self._results[section] = list(found)
+        for issue in self._results[section]:
+            issues.add(issue)
+
+    def invalidate(self, *changes):
+        """Forget everything which depends on these sections or fields"""
+
+        for change in changes:
+            self._lookups.pop(change, None)
+            if change in self.application.RELATED_RECORDS:
+                self.application.forget_related_records(change)
+        application_class = freemoney.models.Application
+        for section in application_class.sections_affected_by(changes):
+            self._results.pop(section, None)
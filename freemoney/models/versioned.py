@@ -0,0 +1,92 @@
+from django.db.models import Manager
+
+
+class VersionedManager(Manager):
+    """Manager for models which are versioned as a linked list.
+
+    A versioned model has an `identifier` SlugField, which is shared by every
+    version of the same logical record, and a nullable `previous_version`
+    ForeignKey to itself. The "head" of the linked list is the latest version:
+    the one which no other version names as its previous version.
+    """
+
+    def _identifier_of(self, instance_or_identifier):
+        if isinstance(instance_or_identifier, self.model):
+            return instance_or_identifier.identifier
+        else:
+            return instance_or_identifier
+
+    def latest_versions_of(self, identifiers):
+        """Return a dict mapping each identifier to its latest version.
+
+        The heads of all of the requested version chains are found with a
+        single query. An identifier with no versions at all maps to None. An
+        obviously broken chain (several heads, or none at all) raises a
+        ValueError; see version_history for the full integrity check.
+        """
+
+        identifiers = set(self._identifier_of(x) for x in identifiers)
+        if len(identifiers) == 0:
+            return {}
+
+        full_set = self.filter(identifier__in=identifiers)
+        successors = full_set.filter(previous_version__isnull=False)
+        heads = {}
+        for head in full_set.exclude(
+                pk__in=successors.values('previous_version')):
+            if head.identifier in heads:
+                raise ValueError('split detected in linked list')
+            heads[head.identifier] = head
+
+        missing = identifiers - set(heads.keys())
+        if len(missing) > 0:
+            if full_set.filter(identifier__in=missing).exists():
+                raise ValueError('cycle detected in linked list')
+            for identifier in missing:
+                heads[identifier] = None
+        return heads
+
+    def latest_version_of(self, instance_or_identifier):
+        """Return the latest version of an instance (or just an identifier)"""
+
+        identifier = self._identifier_of(instance_or_identifier)
+        return self.latest_versions_of([identifier])[identifier]
+
+    def version_history(self, instance_or_identifier):
+        """Return every version of a record, from the oldest to the latest.
+
+        Unlike latest_versions_of, this walks the entire linked list and
+        raises a ValueError on *any* branch or split (including cycles which
+        are disjoint from an otherwise-valid chain). It loads every version,
+        so it is meant for offline integrity checks rather than hot paths.
+        """
+
+        identifier = self._identifier_of(instance_or_identifier)
+        successors = {}
+        count = 0
+        for version in self.filter(identifier=identifier):
+            successors.setdefault(version.previous_version_id, []).append(
+                    version
+            )
+            count += 1
+
+        history = []
+        tail_pk = None
+        while len(history) < count:
+            candidates = successors.get(tail_pk, [])
+            if len(candidates) > 1:
+                raise ValueError('branch detected in linked list')
+            elif len(candidates) == 0:
+                raise ValueError('split detected in linked list')
+            history.append(candidates[0])
+            tail_pk = candidates[0].pk
+        return history
+
+    def check_version_chain(self, instance_or_identifier):
+        """Return the latest version after a full integrity check"""
+
+        history = self.version_history(instance_or_identifier)
+        if len(history) == 0:
+            return None
+        else:
+            return history[-1]
@@ -1,4 +1,5 @@
 from collections import namedtuple
+from django.db import transaction
 from django.forms import (BooleanField,
                           CharField,
                           Form,
@@ -23,7 +24,7 @@ class AwardPage(WizardPageView):
 
     @staticmethod
     def progress_sentry(issues):
-        if len(issues.search(section='award')) > 0:
+        if issues.any_in(section='award'):
             return False
         else:
             return True
@@ -47,16 +48,19 @@ class AwardPage(WizardPageView):
         return AwardSelectionFormSet(self.request.POST)
 
     def save_changes(self):
-        chosen_awards = set()
+        chosen_award_ids = set()
         for single_form in self.form:
             award_id = single_form.cleaned_data['award_id']
             selected = single_form.cleaned_data['selected']
             if selected:
-                award = Award.objects.get(pk=award_id)
-                chosen_awards.add(award)
-        self.application.award_set.set(chosen_awards)
-        self.application.full_clean()
-        self.application.save()
+                chosen_award_ids.add(award_id)
+        chosen_awards = list(Award.objects.filter(pk__in=chosen_award_ids))
+        if len(chosen_awards) != len(chosen_award_ids):
+            raise Award.DoesNotExist('invalid award selection')
+        with transaction.atomic():
+            self.application.award_set.set(chosen_awards)
+            self.application.full_clean()
+            self.application.save()
 
     def add_issues_to_form(self):
         if (len(self.issues.search(section='award',
@@ -101,7 +101,7 @@ class BasicInfoPage(WizardPageView):
 
     @staticmethod
     def progress_sentry(issues):
-        if len(issues.search(section='basicinfo')) > 0:
+        if issues.any_in(section='basicinfo'):
             return False
         else:
             return True
@@ -150,6 +150,15 @@ class BasicInfoPage(WizardPageView):
         return BasicInfoForm(self.request.POST)
 
     def save_changes(self):
+        saved_fields = (BasicInfoPage._direct_copy +
+                        ['psu_email',
+                         'semester_gpa',
+                         'cumulative_gpa',
+                         'semester_initiated',
+                         'semester_graduating'])
+        previous_values = [getattr(self.application, field)
+                           for field in saved_fields]
+
         for field in BasicInfoPage._direct_copy:
             setattr(self.application, field, self.form.cleaned_data[field])
 
@@ -189,6 +198,12 @@ class BasicInfoPage(WizardPageView):
         self.application.full_clean()
         self.application.save()
 
+        changed_fields = []
+        for field, previous_value in zip(saved_fields, previous_values):
+            if getattr(self.application, field) != previous_value:
+                changed_fields.append(field)
+        return changed_fields
+
     def add_issues_to_form(self):
         if (len(self.issues.search(section='basicinfo',
                                    field='psu_email',
@@ -228,7 +243,8 @@ class BasicInfoPage(WizardPageView):
                     'major',
                     'major: Some of your award selections are incompatible with your major'
             )
-        for remaining_issue in self.issues.search(section='basicinfo'):
+        for remaining_issue in self.issues.search(section='basicinfo',
+                                                  lazy=True):
             if remaining_issue.field == 'semester_initiated':
                 the_field = 'semestertype_initiated'
                 the_prefix = 'semester_initiated'
@@ -1,22 +1,76 @@
-from django.conf import settings
 from django.contrib.messages import (add_message,
                                      get_messages,
                                      INFO,
                                      ERROR)
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.exceptions import ValidationError, ObjectDoesNotExist
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models import Case, Value, When
+from django.dispatch import receiver
 from django.forms import Form, BaseFormSet
 from django.http import HttpResponse
 from django.shortcuts import render, redirect
+from django.template.loader import get_template
 from django.urls import reverse
 from django.views import View
 from django.views.defaults import server_error
 from freemoney.models import (Application,
                               ApplicantProfile,
                               Award,
+                              CustomValidationContext,
                               CustomValidationIssue,
                               CustomValidationIssueSet,
-                              Semester)
+                              Semester,
+                              get_current_cycle)
+import threading
+
+
+class CompiledTemplateCache:
+    """Process-wide cache of compiled templates, shared by all wizard pages
+
+    Compiling a template costs far more than rendering a small one, so every
+    template (by name) is compiled only once per process. The hits and misses
+    counters are meant for instrumentation and profiling; they are updated
+    under a lock, since the cache is shared by every request thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._templates = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name):
+        """Return the template with this name (as for get_template)"""
+
+        with self._lock:
+            template = self._templates.get(name)
+            if template is not None:
+                self.hits += 1
+                return template
+            self.misses += 1
+        # compile outside of the lock; a concurrent miss just compiles twice
+        template = get_template(name)
+        with self._lock:
+            return self._templates.setdefault(name, template)
+
+    def clear(self):
+        """Forget every compiled template, and reset the counters"""
+
+        with self._lock:
+            self._templates = {}
+            self.hits = 0
+            self.misses = 0
+
+
+template_cache = CompiledTemplateCache()
+
+
+@receiver(setting_changed)
+def _clear_template_cache_on_setting_change(setting, **kwargs_):
+    if setting == 'TEMPLATES':
+        template_cache.clear()
 
 
 class WizardPageView(LoginRequiredMixin, View):
@@ -38,17 +92,24 @@ class WizardPageView(LoginRequiredMixin, View):
 
     These hooks and data are used in conjunction with the rendering procedure,
     which follows these steps (note: later steps can use earlier variables):
-    1.  set self.request, self.applicant, self.application, and self.issues
+    1.  set self.request, self.applicant, self.application, and
+        self.validation_context (which caches lookups made by validation)
     2.  call progress_sentry through prev_page chain, but *not* for this page
+        (the outcomes are remembered in the session; see _load_page_plan)
     3.  set self.form to result of prepopulate_form (GET) or parse_form (POST)
     4.  call save_changes if the form is bound and the *form* fields are valid
         NOTE: this ^^ is called and should work regardless of *model* validity
-    5.  update self.issues with any issues detected following save_changes
+    5.  set self.issues to the issues detected following save_changes, and
+        store them with the Application (see Application.store_issues); a GET
+        reuses them, rather than validating again, until the data changes
     6.  if attempting to go to the next page, verify with self.progress_sentry
     7.  if blocked or rendering this page w/ errors, call add_issues_to_form
     8.  self.context is generated with common info (e.g., buttons and URLs)
     9.  call finalize_context, which should add info as needed to self.context
     10. template is rendered using the page_name set by the subclass
+
+    A POST runs as a single transaction, during which the Application's row
+    is locked; concurrent POSTs for the same Application are serialized.
     """
 
     # (short name, display name)
@@ -61,16 +122,23 @@ class WizardPageView(LoginRequiredMixin, View):
     # don't allow PUT, PATCH, DELETE, or TRACE
     http_method_names = ['get', 'post', 'head', 'options']
 
+    # compiled templates for page fragments, shared by every page
+    template_cache = template_cache
+
+    # see _load_page_plan
+    PAGE_PLAN_SESSION_KEY = 'freemoney_page_plan'
+
     def __init__(self, *args, **kwargs):
         super(WizardPageView, self).__init__(*args, **kwargs)
         self.request = None
         self.applicant = None
         self.application = None
         self.issues = None
+        self.validation_context = None
         self.form = None
         self.context = None
 
-    def _initialize_for_request(self, request):
+    def _initialize_for_request(self, request, lock=False):
         self.request = request
 
         try:
@@ -83,6 +151,8 @@ class WizardPageView(LoginRequiredMixin, View):
             return server_error(self.request)
 
         try:
+            if lock:
+                self.applicant.lock_current_application()
             self.application = self.applicant.current_application
             if self.application.submitted:
                 return redirect(self._uri_of('submitted'))
@@ -90,17 +160,15 @@ class WizardPageView(LoginRequiredMixin, View):
             # TODO: same landing page as for non-applicant users
             return server_error(self.request)
 
-        self.issues = CustomValidationIssueSet()
-        self.application.custom_validate(self.issues)
+        self.validation_context = CustomValidationContext(self.application)
+        self.issues = None
+        self._page_plan = self._load_page_plan()
 
         self._my_pages = []
         self._page_index = None
-        needs_finaid = Award.objects.check_app_needs_finaid(self.application)
-        needs_essay = Award.objects.check_app_needs_essay(self.application)
         for index, names in enumerate(WizardPageView.PAGES):
             short_name, long_name = names
-            if ((not needs_finaid and short_name == 'finaid') or
-                (not needs_essay and short_name == 'essay')):
+            if short_name not in self._page_plan['pages']:
                 if type(self).page_name == short_name:
                     return redirect(self._uri_of(self._my_pages[-1][0]))
                 else:
@@ -117,6 +185,69 @@ class WizardPageView(LoginRequiredMixin, View):
                         'Please complete this section first')
             return redirect(self._uri_of(failing_sentry.page_name))
 
+    def _validate(self):
+        """Make sure that self.issues has been computed (or loaded)"""
+
+        if self.issues is None:
+            self.issues = self.application.cached_issues(
+                    self.validation_context
+            )
+        if self.issues is None:
+            self.issues = CustomValidationIssueSet()
+            self.application.custom_validate(self.issues,
+                                             self.validation_context)
+            self.application.store_issues(self.issues,
+                                          self.validation_context)
+
+    def _page_plan_fingerprint(self):
+        award_ids = sorted(award.pk
+                           for award in self.application.award_set.all())
+        return '{}:{}:{}:{}'.format(self.application.pk,
+                                    self.application.data_version,
+                                    ','.join(str(x) for x in award_ids),
+                                    self.validation_context.catalog.stamp)
+
+    def _load_page_plan(self):
+        """Return the page plan from the session, unless it is outdated
+
+        The page plan lists the visible pages, along with the outcome of each
+        progress_sentry which has been checked so far (see _sentry_passes).
+        It is kept in the session, keyed by a fingerprint of the Application
+        (including its data_version) and its award selection. A POST which
+        saves changes replaces it.
+        """
+
+        fingerprint = self._page_plan_fingerprint()
+        page_plan = self.request.session.get(self.PAGE_PLAN_SESSION_KEY)
+        if page_plan is None or page_plan['fingerprint'] != fingerprint:
+            page_plan = self._new_page_plan(fingerprint)
+        return page_plan
+
+    def _new_page_plan(self, fingerprint):
+        needed_sections = Award.objects.sections_needed_by(self.application)
+        page_plan = {
+                'fingerprint': fingerprint,
+                'pages': [short_name for short_name, long_name_
+                          in WizardPageView.PAGES
+                          if (short_name not in Award.SECTION_FLAGS or
+                              short_name in needed_sections)],
+                'sentries': {},
+        }
+        self.request.session[self.PAGE_PLAN_SESSION_KEY] = page_plan
+        return page_plan
+
+    def _sentry_passes(self, checked_class):
+        """Call progress_sentry for a page, unless the plan has the outcome"""
+
+        sentries = self._page_plan['sentries']
+        if checked_class.page_name not in sentries:
+            self._validate()
+            sentries[checked_class.page_name] = checked_class.progress_sentry(
+                    self.issues
+            )
+            self.request.session.modified = True
+        return sentries[checked_class.page_name]
+
     def _find_failing_sentry(self, including_me):
         if including_me:
             checked_class = type(self)
@@ -126,7 +257,7 @@ class WizardPageView(LoginRequiredMixin, View):
         while checked_class is not None:
             if not hasattr(checked_class, 'progress_sentry'):
                 checked_class = getattr(checked_class, 'prev_page', None)
-            elif checked_class.progress_sentry(self.issues):
+            elif self._sentry_passes(checked_class):
                 checked_class = getattr(checked_class, 'prev_page', None)
             else:
                 return checked_class
@@ -139,7 +270,7 @@ class WizardPageView(LoginRequiredMixin, View):
                 'steps': [],
                 'currentstep': type(self).page_name,
                 'postback': self._uri_of(self.page_name),
-                'deadline': settings.FREEMONEY_DUE_DATE.date,
+                'deadline': get_current_cycle().due_at.date,
                 'buttons': [x[0] for x in self._calculate_valid_buttons()],
         }
         for short_name, long_name in self._my_pages:
@@ -182,6 +313,7 @@ class WizardPageView(LoginRequiredMixin, View):
 
         base_context = self._generate_base_context()
         if len(base_context['errors']) > 0:
+            self._validate()
             self.add_issues_to_form()
 
         self.context = base_context
@@ -198,14 +330,26 @@ class WizardPageView(LoginRequiredMixin, View):
         if type(self) == WizardPageView:
             raise NotImplementedError('WizardPageView is an abstract base')
         else:
-            error_response = self._initialize_for_request(request)
-            if error_response is not None:
-                return error_response
+            # one transaction per POST, holding the Application's row lock
+            with transaction.atomic():
+                return self._post(request)
+
+    def _post(self, request):
+        error_response = self._initialize_for_request(request, lock=True)
+        if error_response is not None:
+            return error_response
 
         self.form = self.parse_form()
         if self.form is None or self.form.is_valid():
+            changes = []
             if self.form is not None:
-                self.save_changes()
+                # data_version is incremented just once, by store_issues
+                with self.application.deferring_data_version():
+                    changes = self.save_changes()
+                if changes is None:
+                    # by default, a page edits the section sharing its name
+                    changes = [self.page_name]
+                self.validation_context.invalidate(*changes)
 
             submit_type = request.POST.get('submit-type', default=None)
 
@@ -213,14 +357,24 @@ class WizardPageView(LoginRequiredMixin, View):
                 self.application.submitted = True
 
             self.issues = CustomValidationIssueSet()
-            self.application.custom_validate(self.issues)
+            self.application.custom_validate(self.issues,
+                                             self.validation_context)
+            self.application.store_issues(self.issues,
+                                          self.validation_context,
+                                          data_changed=(len(changes) > 0))
+            if len(changes) > 0:
+                # the saved changes may affect any progress_sentry
+                self._page_plan = self._new_page_plan(
+                        self._page_plan_fingerprint()
+                )
 
             if submit_type == 'restart':
                 self.application.delete()
                 self.application = Application.objects.create(
-                        due_at=settings.FREEMONEY_DUE_DATE,
+                        due_at=get_current_cycle().due_at,
                         applicant=self.applicant
                 )
+                self.applicant.current_application = self.application
                 self.applicant.full_clean()
                 self.applicant.save()
                 add_message(self.request, INFO,
@@ -236,7 +390,9 @@ class WizardPageView(LoginRequiredMixin, View):
                         redirect_to = self._my_pages[self._page_index + 1][0]
                     elif submit_type == 'submit':
                         self.application.full_clean()
-                        self.application.save()
+                        # (the submitted flag does not affect the issues)
+                        with self.application.deferring_data_version():
+                            self.application.save()
                         redirect_to = 'submitted'
                     else:
                         redirect_to = self._my_pages[self._page_index][0]
@@ -269,6 +425,11 @@ class WizardPageView(LoginRequiredMixin, View):
         database without regard for model-level validation, in order to enable
         saving incomplete applications. Model-level validation is handled
         elsewhere, by other hooks.
+
+        Optionally, return the names of the sections and/or Application
+        fields which were actually changed (see
+        Application.sections_affected_by), so that only the affected sections
+        are re-validated. By default, the page's own section is assumed.
         """
         pass
 
@@ -285,3 +446,26 @@ class WizardPageView(LoginRequiredMixin, View):
     def finalize_context(self):
         """Add any extra information to self.context, as required"""
         pass
+
+
+def bulk_update(model, instances, fields):
+    """Save some fields of several existing instances with a single UPDATE
+
+    Each field is set through a CASE expression on the primary key. Unlike
+    save(), no signals are sent. Does nothing if there are no instances.
+    """
+
+    instances = list(instances)
+    if len(instances) == 0:
+        return
+
+    updates = {}
+    for name in fields:
+        field = model._meta.get_field(name)
+        updates[name] = Case(*[When(pk=instance.pk,
+                                    then=Value(getattr(instance, name),
+                                               output_field=field))
+                               for instance in instances],
+                             output_field=field)
+    model.objects.filter(pk__in=[instance.pk for instance in instances]
+    ).update(**updates)
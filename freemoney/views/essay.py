@@ -1,12 +1,11 @@
 from django.conf import settings
+from django.db import transaction
 from django.forms import (CharField,
                           Form,
                           formset_factory,
                           HiddenInput,
                           IntegerField,
                           Textarea)
-from django.template import RequestContext, Template
-from django.utils.safestring import mark_safe
 from freemoney.models import (Application,
                               ApplicantProfile,
                               Essay,
@@ -14,7 +13,7 @@ from freemoney.models import (Application,
 import re
 
 
-from .common import WizardPageView
+from .common import WizardPageView, bulk_update
 from .finaid import FinancialAidPage
 
 
@@ -26,7 +25,7 @@ class EssayPage(WizardPageView):
 
     @staticmethod
     def progress_sentry(issues):
-        if len(issues.search(section='essay')) > 0:
+        if issues.any_in(section='essay'):
             return False
         else:
             return True
@@ -35,10 +34,11 @@ class EssayPage(WizardPageView):
         # TODO: should probably become an official part of common
         self._form_elements = []
         initial_data = []
-        existing_responses = list(Essay.objects.filter(
-                application=self.application
-        ).all())
-        all_prompts = EssayPrompt.objects.for_application(self.application)
+        existing_responses = self._existing_responses()
+        all_prompts = EssayPrompt.objects.for_application(
+                self.application,
+                self.validation_context
+        )
         for subset_index, prompt_or_subset in enumerate(all_prompts):
             if isinstance(prompt_or_subset, EssayPrompt):
                 subset = [prompt_or_subset]
@@ -47,11 +47,10 @@ class EssayPage(WizardPageView):
 
             for prompt in subset:
                 initial_data_row = {'prompt_id': prompt.pk}
-                for response in existing_responses:
-                    if response.prompt == prompt:
-                        initial_data_row['response'] = response.response
-                        break
-                if 'response' not in initial_data_row:
+                if prompt.pk in existing_responses:
+                    response = existing_responses[prompt.pk]
+                    initial_data_row['response'] = response.response
+                else:
                     initial_data_row['response'] = ''
                 self._form_elements.append((
                         prompt.pk,
@@ -67,60 +66,64 @@ class EssayPage(WizardPageView):
     def parse_form(self):
         return EssayFormSet(self.request.POST)
 
+    def _existing_responses(self):
+        """Map the pk of each answered EssayPrompt to its Essay response"""
+
+        existing_responses = {}
+        for response in self.validation_context.essays:
+            existing_responses[response.prompt_id] = response
+        return existing_responses
+
     def save_changes(self):
-        existing_responses = list(Essay.objects.filter(
-                application=self.application
-        ).all())
-        all_prompts = EssayPrompt.objects.for_application(self.application)
-        preserved_responses = []
+        existing_responses = self._existing_responses()
+        all_prompts = {}
+        for prompt_or_subset in EssayPrompt.objects.for_application(
+                self.application,
+                self.validation_context):
+            if isinstance(prompt_or_subset, list):
+                for prompt in prompt_or_subset:
+                    all_prompts[prompt.pk] = prompt
+            else:
+                all_prompts[prompt_or_subset.pk] = prompt_or_subset
+
+        # work out the differences first, then apply them all at once
+        created_responses = []
+        changed_responses = []
+        preserved_prompt_ids = set()
         for individual in self.form:
-            the_prompt = None
-            for prompt in all_prompts:
-                if isinstance(prompt, list):
-                    for subprompt in prompt:
-                        if subprompt.pk == individual.cleaned_data['prompt_id']:
-                            the_prompt = subprompt
-                            break
-                else:
-                    if prompt.pk == individual.cleaned_data['prompt_id']:
-                        the_prompt = prompt
-                        break
-            if the_prompt is None:
+            prompt_id = individual.cleaned_data['prompt_id']
+            if prompt_id not in all_prompts:
                 raise KeyError('bad prompt id')
+            the_prompt = all_prompts[prompt_id]
+            existing_response = existing_responses.get(prompt_id)
 
-            existing_response = None
-            for response in existing_responses:
-                if response.prompt.pk == the_prompt.pk:
-                    existing_response = response
-                    break
-
-            if re.match(r'^\s*$', individual.cleaned_data['response']):
-                if existing_response is not None:
-                    existing_response.delete()
-            else:
+            # a cleared response is deleted below, with the unused ones
+            new_response = individual.cleaned_data['response']
+            if not re.match(r'^\s*$', new_response):
+                preserved_prompt_ids.add(prompt_id)
                 if existing_response is None:
-                    new_response = Essay.objects.create(
-                            application=self.application,
-                            prompt=the_prompt,
-                            response=individual.cleaned_data['response']
-                    )
-
-                    preserved_responses.append(new_response)
-                else:
-                    new_response = individual.cleaned_data['response']
+                    created_response = Essay(application=self.application,
+                                             prompt=the_prompt,
+                                             response=new_response)
+                    created_response.full_clean(exclude=['application',
+                                                         'prompt'])
+                    created_responses.append(created_response)
+                elif existing_response.response != new_response:
                     existing_response.response = new_response
-                    existing_response.full_clean()
-                    existing_response.save()
-                    preserved_responses.append(existing_response)
-
-        for existing_response in existing_responses:
-            found = False
-            for preserved_response in preserved_responses:
-                if preserved_response == existing_response:
-                    found = True
-                    break
-            if not found:
-                existing_response.delete()
+                    existing_response.full_clean(exclude=['application',
+                                                          'prompt'])
+                    changed_responses.append(existing_response)
+
+        removed_pks = [response.pk for prompt_id, response
+                       in existing_responses.items()
+                       if prompt_id not in preserved_prompt_ids]
+        with transaction.atomic():
+            if len(removed_pks) > 0:
+                Essay.objects.filter(application=self.application,
+                                     pk__in=removed_pks).delete()
+            if len(created_responses) > 0:
+                Essay.objects.bulk_create(created_responses)
+            bulk_update(Essay, changed_responses, ['response'])
 
     def add_issues_to_form(self):
         for issue in self.issues.search(section='essay', discard=True):
@@ -151,78 +154,23 @@ class EssayPage(WizardPageView):
                             element[4].append(message)
 
     def finalize_context(self):
-        self.context['the_section'] = '<div class="well essay_subset">'
-
-        single_instructions ="<p>Please answer this essay question.</p><hr />"
-        multi_instructions = "<p>Please answer <em>only one</em> of the essay questions in this group.<p><hr />"
-
-        if len(self.form) > 1:
-            if self._form_elements[0][2] == self._form_elements[1][2]:
-                # First two essays are in the same subset
-                self.context['the_section'] += multi_instructions
-            else:
-                self.context['the_section'] += single_instructions
-        elif len(self.form) == 1:
-            self.context['the_section'] += single_instructions
-        else:
-            self.context['the_section'] += 'No essay questions for your chosen awards.</div>'
-        need_instructions = False
-
-        for index in range(len(self.form)):
-            if need_instructions == True:
-                if index + 1 >= len(self.form):
-                    # obviously no additional subset items past the end
-                    self.context['the_section'] += single_instructions
-                elif (self._form_elements[index][2] ==
-                      self._form_elements[index + 1][2]):
-                    self.context['the_section'] += multi_instructions
-                else:
-                    self.context['the_section'] += single_instructions
-                need_instructions = False
-
-            self.context['the_section'] += '<p><strong>Question: </strong>'
-            self.context['the_section'] += self._form_elements[index][1]
-            self.context['the_section'] += ' <em>('
-            self.context['the_section'] += str(self._form_elements[index][3])
-            self.context['the_section'] += ' word limit)</em>'
-            self.context['the_section'] += '</p>'
-
-            template = Template('{% load bootstrap3 %}{% bootstrap_field field show_label=False %}')
-            temp_ctx = RequestContext(self.request)
-            temp_ctx.update({'field': self.form[index]['prompt_id']})
-            self.context['the_section'] += template.render(temp_ctx)
-
-            template = Template('{% load bootstrap3 %}{% bootstrap_field field show_label=False %}')
-            temp_ctx = RequestContext(self.request)
-            temp_ctx.update({'field': self.form[index]['response']})
-            self.context['the_section'] += template.render(temp_ctx)
-
-            if len(self._form_elements[index][4]) > 0:
-                error_list = '<ul></ul>'
-                for error in self._form_elements[index][4]:
-                    insert_at = error_list.find('</ul>')
-                    error_list = (error_list[0:insert_at] +
-                                    '<li>{}</li>'.format(error) +
-                                    error_list[insert_at:])
-            else:
-                error_list = ''
-            self.context['the_section'] += error_list
-
-            if index + 1 >= len(self.form):
-                # obviously the end of the current subset
-                self.context['the_section'] += '</div>'
-            elif (self._form_elements[index][2] ==
-                  self._form_elements[index + 1][2]):
-                # amidst a subset; add a horizontal rule for clarity
-                self.context['the_section'] += '<hr />'
-            else:
-                # the end of this subset and the beginning of another
-                self.context['the_section'] += '</div>'
-                self.context['the_section'] += '<div class="row">&nbsp;</div>'
-                self.context['the_section'] += '<div class="well essay_subset">'
-                need_instructions = True
-
-        self.context['the_section'] = mark_safe(self.context['the_section'])
+        # consecutive essays from the same subset form a group
+        groups = []
+        previous_subset_index = None
+        for index, element in enumerate(self._form_elements):
+            prompt_pk_, prompt, subset_index, word_limit, errors = element
+            if len(groups) == 0 or subset_index != previous_subset_index:
+                groups.append([])
+            groups[-1].append({'prompt': prompt,
+                               'word_limit': word_limit,
+                               'prompt_id': self.form[index]['prompt_id'],
+                               'response': self.form[index]['response'],
+                               'errors': errors})
+            previous_subset_index = subset_index
+
+        template = self.template_cache.get('essay_section.html')
+        self.context['the_section'] = template.render({'groups': groups},
+                                                      self.request)
 
 
 class EssayForm(Form):
@@ -1,5 +1,6 @@
 from collections import namedtuple
 from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.forms import (BaseFormSet,
                           BooleanField,
                           CharField,
@@ -8,12 +9,11 @@ from django.forms import (BaseFormSet,
                           formset_factory,
                           HiddenInput,
                           IntegerField)
-from django.template import RequestContext, Template
 from django.utils.safestring import mark_safe
 from freemoney.models import (FinancialAid,
                               Semester)
 
-from .common import WizardPageView
+from .common import WizardPageView, bulk_update
 from .basicinfo import BasicInfoPage
 
 
@@ -39,9 +39,12 @@ class FinancialAidPage(WizardPageView):
                     'provider',
                     'installment_frequency']
 
+    # every field which save_changes might change
+    _saved = _direct_copy + ['installment_amount', 'semester_finished']
+
     @staticmethod
     def progress_sentry(issues):
-        if len(issues.search(section='finaid')) > 0:
+        if issues.any_in(section='finaid'):
             return False
         else:
             return True
@@ -49,7 +52,7 @@ class FinancialAidPage(WizardPageView):
     def prepopulate_form(self):
         self._form_errors = []
         initial_data = []
-        for finaid in self.application.financialaid_set.iterator():
+        for finaid in self.application.financialaid_set.all():
             initial_data_row = {'finaid_id': finaid.pk}
 
             for copy_field in FinancialAidPage._direct_copy:
@@ -78,39 +81,39 @@ class FinancialAidPage(WizardPageView):
         return FinancialAidFormSet(self.request.POST)
 
     def save_changes(self):
+        current_finaids = {}
+        for finaid in self.validation_context.financial_aids:
+            current_finaids[finaid.pk] = finaid
+
         submit_type = self.request.POST.get('submit-type')
         if submit_type.startswith('delete-'):
             delete_pk = int(submit_type.replace('delete-', ''))
-            FinancialAid.objects.get(
-                    application=self.application,
-                    pk=delete_pk
-            ).delete()
+            if delete_pk not in current_finaids:
+                raise KeyError('invalid primary key provided')
         else:
             delete_pk = None
 
-        current_finaids = set(self.application.financialaid_set.iterator())
-        preserved_finaids = set()
+        # work out the differences first, then apply them all at once
+        created_finaids = []
+        changed_finaids = []
+        preserved_pks = set()
         for individual in self.form:
             if individual.empty_permitted:
                 if individual.is_entirely_blank:
                     continue
                 else:
-                    finaid = FinancialAid.objects.create(
-                            application=self.application
-                    )
-                    current_finaids.add(finaid)
-                    preserved_finaids.add(finaid)
+                    finaid = FinancialAid(application=self.application)
+                    created_finaids.append(finaid)
             elif individual.cleaned_data['finaid_id'] == delete_pk:
                 continue
             else:
-                finaid = None
-                for finaid_try in current_finaids:
-                    if finaid_try.pk == individual.cleaned_data['finaid_id']:
-                        finaid = finaid_try
-                        preserved_finaids.add(finaid)
-                        break
-                if finaid is None:
+                finaid_pk = individual.cleaned_data['finaid_id']
+                if finaid_pk not in current_finaids:
                     raise KeyError('invalid primary key provided')
+                finaid = current_finaids[finaid_pk]
+                preserved_pks.add(finaid_pk)
+                previous_values = [getattr(finaid, field)
+                                   for field in FinancialAidPage._saved]
 
             for field in FinancialAidPage._direct_copy:
                 if field in individual.cleaned_data:
@@ -130,11 +133,22 @@ class FinancialAidPage(WizardPageView):
             if when_finished[0] != '' and when_finished[1] is not None:
                 finaid.semester_finished = Semester(when_finished)
 
-            finaid.full_clean()
-            finaid.save()
-
-        for removed_finaid in current_finaids - preserved_finaids:
-            removed_finaid.delete()
+            # (the Application itself is known to be valid)
+            finaid.full_clean(exclude=['application'])
+            if finaid.pk is not None:
+                if previous_values != [getattr(finaid, field)
+                                       for field in FinancialAidPage._saved]:
+                    changed_finaids.append(finaid)
+
+        removed_pks = set(current_finaids.keys()) - preserved_pks
+        with transaction.atomic():
+            if len(removed_pks) > 0:
+                FinancialAid.objects.filter(application=self.application,
+                                            pk__in=removed_pks).delete()
+            if len(created_finaids) > 0:
+                FinancialAid.objects.bulk_create(created_finaids)
+            bulk_update(FinancialAid, changed_finaids,
+                        FinancialAidPage._saved)
 
     def add_issues_to_form(self):
         row_errors = {('aid_type', 'required'): 'Aid type is required',
@@ -170,133 +184,81 @@ class FinancialAidPage(WizardPageView):
         else:
             return 'odd'
 
+    # (label, colspan, help text) for each column of the table
+    _columns = [('Type of aid', 2,
+                 'Select the nearest choice, or Other'),
+                ('Provider', 3,
+                 'Full name of the organization, sponsor, etc.'),
+                ('End date', 2,
+                 'The last semester during which you will be receiving these funds (leave blank if not applicable)'),
+                ('Installment amount', 2,
+                 'How much do you receive with each installment?'),
+                ('Installment frequency', 2,
+                 'How often do you receive this money?')]
+
+    # (field, colspan, addon, combination) for each cell of a body row
+    _cells = [('aid_type', 2, '', None),
+              ('provider', 3, '', None),
+              ('semestertype_finished', 1, '', 'left-combine'),
+              ('year_finished', 1, '', 'right-combine'),
+              ('installment_amount', 2, '$', None),
+              ('installment_frequency', 2, '', None)]
+
     def finalize_context(self):
-        self.context['the_table'] = '<table></table>'
+        has_delete_column = (self.form.total_form_count() > 1)
 
-        label_row = ''
-        help_text_row = ''
+        headers = []
         even_odd = 'odd'
-        for label_set in [('Type of aid', 2,
-                           'Select the nearest choice, or Other'),
-                          ('Provider', 3,
-                           'Full name of the organization, sponsor, etc.'),
-                          ('End date', 2,
-                           'The last semester during which you will be receiving these funds (leave blank if not applicable)'),
-                          ('Installment amount', 2,
-                           'How much do you receive with each installment?'),
-                          ('Installment frequency', 2,
-                           'How often do you receive this money?')]:
-            label_row += '<th class="{}" colspan="{}">{}</th>'.format(
-                    even_odd,
-                    label_set[1],
-                    label_set[0]
-            )
-            help_text_row += '<td class="{}" colspan="{}">{}</td>'.format(
-                    even_odd,
-                    label_set[1],
-                    label_set[2]
-            )
+        for label, colspan, help_text in FinancialAidPage._columns:
+            headers.append({'classes': even_odd,
+                            'colspan': colspan,
+                            'label': label,
+                            'help_text': help_text})
             even_odd = FinancialAidPage._switch_even_odd(even_odd)
+        if has_delete_column:
+            headers.append({'classes': even_odd,
+                            'colspan': 1,
+                            'label': mark_safe('&nbsp;'),
+                            'help_text': None})
 
-        if self.form.total_form_count() > 1:
-            label_row += '<th class="{}" colspan="1">&nbsp;</th>'.format(
-                    even_odd
-            )
-            help_text_row += '<th class="{}" colspan="1">&nbsp;</th>'.format(
-                    even_odd
-            )
-            even_odd = FinancialAidPage._switch_even_odd(even_odd)
-
-        insert_at = self.context['the_table'].find('</table>')
-        self.context['the_table'] = (self.context['the_table'][0:insert_at] +
-                                     '<tr>{}</tr>'.format(label_row) +
-                                     '<tr>{}</tr>'.format(help_text_row) +
-                                     self.context['the_table'][insert_at:])
-
+        rows = []
         for row_index, individual in enumerate(self.form):
-            template = Template('{% load bootstrap3 %}{% ' + " ".join([
-                                        'bootstrap_field',
-                                        'field',
-                                        'show_label=False']) +
-                                ' %}')
-            subcontext = RequestContext(self.request)
-            subcontext.update({'field': individual['finaid_id']})
-            self.context['the_table'] += template.render(subcontext)
-
-            body_row = ''
-            even_odd = 'odd'
-
             errors_by_field = {}
             if not individual.empty_permitted:
-                if len(self._form_errors[row_index][1]) > 0:
-                    for form_error in self._form_errors[row_index][1]:
-                        field, error = form_error
-                        if field in errors_by_field:
-                            errors_by_field[field].append(error)
-                        else:
-                            errors_by_field[field] = [error]
-
-            for field_set in [('aid_type', 2, None, None),
-                              ('provider', 3, None, None),
-                              ('semestertype_finished', 1, None, 'left-combine'),
-                              ('year_finished', 1, None, 'right-combine'),
-                              ('installment_amount', 2, '$', None),
-                              ('installment_frequency', 2, None, None)]:
-                if field_set[2] is None:
-                    template = Template('{% load bootstrap3 %}{% ' + " ".join([
-                                                'bootstrap_field',
-                                                'field',
-                                                'show_label=False']) +
-                                        ' %}')
-                else:
-                    template = Template('{% load bootstrap3 %}{% ' + " ".join([
-                                                'bootstrap_field',
-                                                'field',
-                                                'addon_before="{}"'.format(field_set[2]),
-                                                'show_label=False']) +
-                                        ' %}')
-
-                if field_set[3] is None:
+                for field, error in self._form_errors[row_index][1]:
+                    errors_by_field.setdefault(field, []).append(error)
+
+            cells = []
+            even_odd = 'odd'
+            for field, colspan, addon, combination in FinancialAidPage._cells:
+                if combination is None:
                     classes = even_odd
                     even_odd = FinancialAidPage._switch_even_odd(even_odd)
-                elif field_set[3] == 'left-combine':
-                    classes = " ".join([even_odd, field_set[3]])
+                elif combination == 'left-combine':
+                    classes = " ".join([even_odd, combination])
                     # don't switch yet
-                elif field_set[3] == 'right-combine':
-                    classes = " ".join([even_odd, field_set[3]])
+                elif combination == 'right-combine':
+                    classes = " ".join([even_odd, combination])
                     even_odd = FinancialAidPage._switch_even_odd(even_odd)
-
-                if field_set[0] in errors_by_field:
-                    error_list = '<ul></ul>'
-                    for error in errors_by_field[field_set[0]]:
-                        insert_at = error_list.find('</ul>')
-                        error_list = (error_list[0:insert_at] +
-                                      '<li>{}</li>'.format(error) +
-                                      error_list[insert_at:])
-                else:
-                    error_list = ''
-
-                subcontext = RequestContext(self.request)
-                subcontext.update({'field': individual[field_set[0]]})
-                body_row = (body_row +
-                            '<td class="{}" colspan="{}">{}{}</td>'.format(
-                                    classes,
-                                    field_set[1],
-                                    template.render(subcontext),
-                                    error_list))
-
-            if self.form.total_form_count() > 1:
-                body_row += '<td class="{}" colspan="1"></td>'.format(
-                        even_odd
-                )
-                even_odd = FinancialAidPage._switch_even_odd(even_odd)
-
-            insert_at = self.context['the_table'].rfind('<tr>')
-            self.context['the_table'] = (self.context['the_table'][0:insert_at] +
-                                        '<tr>{}</tr>'.format(body_row) +
-                                        self.context['the_table'][insert_at:])
-
-        self.context['the_table'] = mark_safe(self.context['the_table'])
+                cells.append({'classes': classes,
+                              'colspan': colspan,
+                              'field': individual[field],
+                              'addon': addon,
+                              'errors': errors_by_field.get(field, [])})
+            if has_delete_column:
+                cells.append({'classes': even_odd,
+                              'colspan': 1,
+                              'field': None,
+                              'addon': '',
+                              'errors': []})
+
+            rows.append({'finaid_id': individual['finaid_id'],
+                         'cells': cells})
+
+        template = self.template_cache.get('finaid_table.html')
+        self.context['the_table'] = template.render({'headers': headers,
+                                                     'rows': rows},
+                                                    self.request)
 
 class FinancialAidForm(Form):
     """Django form which represents a single FinancialAid record"""
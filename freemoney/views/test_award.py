@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta, timezone
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from freemoney.models import (Application,
+                              ApplicantProfile,
+                              Award,
+                              CustomValidationContext,
+                              invalidate_catalog)
+
+
+@override_settings(FREEMONEY_DUE_DATE=datetime(
+        2017, 4, 10, 23, 59, 59, tzinfo=timezone(timedelta(hours=-5))
+))
+class AwardPageTests(TestCase):
+    """Verify that the award page saves the selected awards"""
+
+    def setUp(self):
+        invalidate_catalog()
+        self.addCleanup(invalidate_catalog)
+        applicant = ApplicantProfile.objects.create(
+                user=get_user_model().objects.create_user(
+                        username='test@example.com',
+                        password='pass1234'
+                ),
+                must_change_password=False
+        )
+        self.application = Application.objects.create(
+                applicant=applicant,
+                due_at=datetime(2017, 4, 10, 23, 59, 59,
+                                tzinfo=timezone(timedelta(hours=-5)))
+        )
+        self.awards = Award.objects.for_semester()
+        self.client.login(username='test@example.com', password='pass1234')
+
+    def _post(self, selected_identifiers, award_ids=None):
+        if award_ids is None:
+            award_ids = [award.pk for award in self.awards]
+        data = {'form-TOTAL_FORMS': len(self.awards),
+                'form-INITIAL_FORMS': len(self.awards),
+                'submit-type': 'save'}
+        for index, award in enumerate(self.awards):
+            data['form-{}-award_id'.format(index)] = award_ids[index]
+            data['form-{}-name'.format(index)] = award.name
+            data['form-{}-description'.format(index)] = award.description
+            if award.identifier in selected_identifiers:
+                data['form-{}-selected'.format(index)] = 'on'
+        return self.client.post('/freemoney/award', data)
+
+    def _selected_identifiers(self):
+        return set(award.identifier
+                   for award in self.application.award_set.all())
+
+    def test_select_and_deselect(self):
+        """The selection replaces whichever awards were selected before"""
+
+        response = self._post({'ean_hong', 'excellence'})
+        self.assertEqual(302, response.status_code)
+        self.assertEqual({'ean_hong', 'excellence'},
+                         self._selected_identifiers())
+
+        self._post({'excellence', 'pledge'})
+        self.assertEqual({'excellence', 'pledge'},
+                         self._selected_identifiers())
+
+    def test_data_version_bumped_once(self):
+        """A POST increments data_version once, however much it changes"""
+
+        self._post({'excellence'})
+        self.application.refresh_from_db()
+        data_version = self.application.data_version
+        self._post({'ean_hong', 'pledge'})
+        self.application.refresh_from_db()
+        self.assertEqual(data_version + 1, self.application.data_version)
+        self.assertIsNotNone(self.application.cached_issues(
+                CustomValidationContext(self.application)
+        ))
+
+    def test_unknown_award(self):
+        """A selection which includes a nonexistent award is refused"""
+
+        self._post({'ean_hong'})
+        award_ids = [award.pk for award in self.awards]
+        award_ids[1] = max(Award.objects.values_list('pk', flat=True)) + 1
+        with self.assertRaises(Award.DoesNotExist):
+            self._post({'ean_hong', self.awards[1].identifier}, award_ids)
+        self.assertEqual({'ean_hong'}, self._selected_identifiers())
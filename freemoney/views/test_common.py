@@ -0,0 +1,194 @@
+from datetime import datetime, timedelta, timezone
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.test import TestCase, override_settings
+from freemoney.models import (Application,
+                              ApplicantProfile,
+                              Award,
+                              FinancialAid,
+                              Semester,
+                              invalidate_catalog)
+
+from .common import (CompiledTemplateCache,
+                     WizardPageView,
+                     bulk_update,
+                     template_cache)
+from .essay import EssayPage
+from .finaid import FinancialAidPage
+
+
+class BulkUpdateTests(TestCase):
+    """Verify the single-query update of several records"""
+
+    def setUp(self):
+        applicant = ApplicantProfile.objects.create(
+                user=get_user_model().objects.create_user(
+                        username='test@example.com',
+                        password='pass1234'
+                ),
+                must_change_password=False
+        )
+        self.application = Application.objects.create(
+                applicant=applicant,
+                due_at=datetime(2016, 11, 15, tzinfo=timezone.utc)
+        )
+
+    def test_bulk_update(self):
+        """Each record gets its own values, and only the given fields"""
+
+        finaids = [FinancialAid.objects.create(application=self.application,
+                                               provider=provider,
+                                               installment_amount=1.0)
+                   for provider in ['A', 'B', 'C']]
+        finaids[0].provider = 'Changed A'
+        finaids[0].installment_amount = 10.0
+        finaids[1].provider = 'Changed B'
+        finaids[1].installment_amount = None
+        finaids[2].provider = 'Not saved'
+        with self.assertNumQueries(1):
+            bulk_update(FinancialAid, finaids[:2],
+                        ['provider', 'installment_amount'])
+
+        saved = FinancialAid.objects.order_by('pk')
+        self.assertEqual([('Changed A', 10.0), ('Changed B', None),
+                          ('C', 1.0)],
+                         [(x.provider, x.installment_amount) for x in saved])
+
+    def test_nothing_to_update(self):
+        """No query is made without any records"""
+
+        with self.assertNumQueries(0):
+            bulk_update(FinancialAid, [], ['provider'])
+
+
+class CompiledTemplateCacheTests(TestCase):
+    """Verify the process-wide cache of compiled templates"""
+
+    def test_hits_and_misses(self):
+        """Each template is compiled once, and then reused"""
+
+        cache = CompiledTemplateCache()
+        first = cache.get('finaid_table.html')
+        self.assertEqual((0, 1), (cache.hits, cache.misses))
+        self.assertIs(first, cache.get('finaid_table.html'))
+        self.assertIs(first, cache.get('finaid_table.html'))
+        cache.get('essay_section.html')
+        self.assertEqual((2, 2), (cache.hits, cache.misses))
+
+        cache.clear()
+        self.assertEqual((0, 0), (cache.hits, cache.misses))
+        self.assertIsNot(first, cache.get('finaid_table.html'))
+        self.assertEqual((0, 1), (cache.hits, cache.misses))
+
+    def test_shared_by_pages(self):
+        """Every wizard page uses the same cache"""
+
+        self.assertIs(template_cache, FinancialAidPage.template_cache)
+        self.assertIs(template_cache, EssayPage.template_cache)
+        template = FinancialAidPage.template_cache.get('finaid_table.html')
+        self.assertIs(template,
+                      EssayPage.template_cache.get('finaid_table.html'))
+
+    def test_cleared_by_settings(self):
+        """Changing the TEMPLATES setting forgets every compiled template"""
+
+        template = template_cache.get('finaid_table.html')
+        with override_settings(TEMPLATES=settings.TEMPLATES):
+            self.assertEqual(0, template_cache.misses)
+            self.assertIsNot(template,
+                             template_cache.get('finaid_table.html'))
+
+
+@override_settings(FREEMONEY_DUE_DATE=datetime(
+        2017, 4, 10, 23, 59, 59, tzinfo=timezone(timedelta(hours=-5))
+))
+class PagePlanTests(TestCase):
+    """Verify that the page plan is kept in the session, until outdated"""
+
+    def setUp(self):
+        invalidate_catalog()
+        self.addCleanup(invalidate_catalog)
+        applicant = ApplicantProfile.objects.create(
+                user=get_user_model().objects.create_user(
+                        username='test@example.com',
+                        password='pass1234'
+                ),
+                must_change_password=False
+        )
+        self.application = Application.objects.create(
+                applicant=applicant,
+                due_at=datetime(2017, 4, 10, 23, 59, 59,
+                                tzinfo=timezone(timedelta(hours=-5))),
+                address='123 Main St',
+                phone='609-412-4321',
+                psu_email='abc123@psu.edu',
+                psu_id='912345678',
+                major='Physics',
+                semester_initiated=Semester('FA15'),
+                semester_graduating=Semester('SP19'),
+                cumulative_gpa=3.5,
+                semester_gpa=3.5
+        )
+        self.application.award_set.add(
+                Award.objects.latest_version_of('excellence')
+        )
+        self.client.login(username='test@example.com', password='pass1234')
+
+        # the plan is made by the first request...
+        response = self.client.get('/freemoney/basicinfo')
+        self.assertEqual(200, response.status_code)
+        page_plan = self._page_plan()
+        self.assertEqual(['welcome', 'award', 'basicinfo'],
+                         page_plan['pages'])
+        self.assertEqual({'award': True}, page_plan['sentries'])
+
+        # ...so a (fake) failing sentry in the plan shows whether it is reused
+        page_plan['sentries']['award'] = False
+        session = self.client.session
+        session[WizardPageView.PAGE_PLAN_SESSION_KEY] = page_plan
+        session.save()
+
+    def _page_plan(self):
+        return self.client.session[WizardPageView.PAGE_PLAN_SESSION_KEY]
+
+    def test_reused(self):
+        """The plan from an earlier request is used as it is"""
+
+        self.assertRedirects(self.client.get('/freemoney/basicinfo'),
+                             '/freemoney/award',
+                             fetch_redirect_response=False)
+
+    def test_award_selection_changed(self):
+        """Selecting different awards replaces the plan"""
+
+        self.application.award_set.add(
+                Award.objects.latest_version_of('ean_hong')
+        )
+        response = self.client.get('/freemoney/basicinfo')
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(['welcome', 'award', 'basicinfo', 'finaid', 'essay'],
+                         self._page_plan()['pages'])
+
+    def test_data_version_changed(self):
+        """Any change to the Application's data replaces the plan"""
+
+        Application.objects.filter(pk=self.application.pk).update(
+                data_version=F('data_version') + 1
+        )
+        response = self.client.get('/freemoney/basicinfo')
+        self.assertEqual(200, response.status_code)
+        self.assertEqual({'award': True}, self._page_plan()['sentries'])
+
+    def test_catalog_changed(self):
+        """A new version of the catalog replaces the plan"""
+
+        old = Award.objects.latest_version_of('pledge')
+        Award.objects.create(identifier='pledge',
+                             name=old.name,
+                             description='Updated description',
+                             previous_version=old)
+        invalidate_catalog()
+        response = self.client.get('/freemoney/basicinfo')
+        self.assertEqual(200, response.status_code)
+        self.assertEqual({'award': True}, self._page_plan()['sentries'])
@@ -0,0 +1,135 @@
+from datetime import datetime, timedelta, timezone
+import os.path
+import re
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from freemoney.models import (Application,
+                              ApplicantProfile,
+                              Award,
+                              Essay,
+                              EssayPrompt,
+                              Semester,
+                              invalidate_catalog)
+
+
+@override_settings(FREEMONEY_DUE_DATE=datetime(
+        2017, 4, 10, 23, 59, 59, tzinfo=timezone(timedelta(hours=-5))
+))
+class EssayPageTests(TestCase):
+    """Verify that the essay page saves its responses correctly"""
+
+    def setUp(self):
+        invalidate_catalog()
+        self.addCleanup(invalidate_catalog)
+        applicant = ApplicantProfile.objects.create(
+                user=get_user_model().objects.create_user(
+                        username='test@example.com',
+                        password='pass1234'
+                ),
+                must_change_password=False
+        )
+        self.application = Application.objects.create(
+                applicant=applicant,
+                due_at=datetime(2017, 4, 10, 23, 59, 59,
+                                tzinfo=timezone(timedelta(hours=-5))),
+                address='123 Main St',
+                phone='609-412-4321',
+                psu_email='abc123@psu.edu',
+                psu_id='912345678',
+                major='Physics',
+                semester_initiated=Semester('FA15'),
+                semester_graduating=Semester('SP19'),
+                cumulative_gpa=3.5,
+                semester_gpa=3.5
+        )
+        self.application.award_set.add(
+                Award.objects.latest_version_of('ean_hong')
+        )
+        self.prompts = []
+        for prompt_or_subset in EssayPrompt.objects.for_application(
+                self.application):
+            if isinstance(prompt_or_subset, EssayPrompt):
+                self.prompts.append(prompt_or_subset)
+            else:
+                self.prompts.extend(prompt_or_subset)
+        self.client.login(username='test@example.com', password='pass1234')
+
+    def _post(self, responses):
+        data = {'form-TOTAL_FORMS': len(self.prompts),
+                'form-INITIAL_FORMS': len(self.prompts),
+                'submit-type': 'save'}
+        for index, prompt in enumerate(self.prompts):
+            data['form-{}-prompt_id'.format(index)] = prompt.pk
+            data['form-{}-response'.format(index)] = responses.get(index, '')
+        return self.client.post('/freemoney/essay', data)
+
+    def _saved_responses(self):
+        saved = {}
+        for essay in Essay.objects.filter(application=self.application):
+            saved[self.prompts.index(essay.prompt)] = essay.response
+        return saved
+
+    def test_create_update_delete(self):
+        """Responses are created, changed, and cleared as submitted"""
+
+        self.assertLess(1, len(self.prompts))
+        response = self._post({0: 'First', 1: 'Second'})
+        self.assertEqual(302, response.status_code)
+        self.assertEqual({0: 'First', 1: 'Second'}, self._saved_responses())
+        first_pk = Essay.objects.get(application=self.application,
+                                     prompt=self.prompts[0]).pk
+
+        self._post({0: 'Changed', 1: '   '})
+        self.assertEqual({0: 'Changed'}, self._saved_responses())
+        self.assertEqual(first_pk,
+                         Essay.objects.get(application=self.application).pk)
+
+    def test_unknown_prompt(self):
+        """A response to a prompt for another Award is refused"""
+
+        other_prompt = EssayPrompt.objects.for_award('giff_albright')[0]
+        self.assertNotIn(other_prompt, self.prompts)
+        self.prompts.append(other_prompt)
+        with self.assertRaises(KeyError):
+            self._post({len(self.prompts) - 1: 'Sneaky'})
+        self.assertEqual({}, self._saved_responses())
+
+    def test_section_rendering(self):
+        """The section is rendered just as it was before it had a template"""
+
+        self.application.award_set.add(
+                Award.objects.latest_version_of('ambassador')
+        )
+        self.prompts = []
+        for prompt_or_subset in EssayPrompt.objects.for_application(
+                self.application):
+            if isinstance(prompt_or_subset, EssayPrompt):
+                self.prompts.append(prompt_or_subset)
+            else:
+                self.prompts.extend(prompt_or_subset)
+        responses = {0: 'Short and sweet',
+                     1: ' '.join(['word'] * (self.prompts[1].word_limit + 1))}
+
+        # (with errors, from the failed attempt to submit)
+        data = {'form-TOTAL_FORMS': len(self.prompts),
+                'form-INITIAL_FORMS': len(self.prompts),
+                'submit-type': 'submit'}
+        for index, prompt in enumerate(self.prompts):
+            data['form-{}-prompt_id'.format(index)] = prompt.pk
+            data['form-{}-response'.format(index)] = responses.get(index, '')
+        self.assertRedirects(self.client.post('/freemoney/essay', data),
+                             '/freemoney/essay',
+                             fetch_redirect_response=False)
+        the_section = self.client.get('/freemoney/essay').context[
+                'the_section'
+        ]
+        the_section = re.sub(r'>\s+<', '><', the_section.strip())
+        for index, prompt in enumerate(self.prompts):
+            the_section = the_section.replace(
+                    'value="{}"'.format(prompt.pk),
+                    'value="PROMPT_{}"'.format(index)
+            )
+        expected_path = os.path.join(os.path.dirname(__file__),
+                                     'test_data', 'essay_section.html')
+        with open(expected_path, newline='') as expected:
+            self.assertEqual(expected.read().strip(), the_section)
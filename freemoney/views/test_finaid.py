@@ -0,0 +1,186 @@
+from datetime import datetime, timedelta, timezone
+import os.path
+import re
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from freemoney.models import (Application,
+                              ApplicantProfile,
+                              Award,
+                              FinancialAid,
+                              Semester,
+                              invalidate_catalog)
+
+
+@override_settings(FREEMONEY_DUE_DATE=datetime(
+        2017, 4, 10, 23, 59, 59, tzinfo=timezone(timedelta(hours=-5))
+))
+class FinancialAidPageTests(TestCase):
+    """Verify that the financial aid page saves its formset correctly"""
+
+    def setUp(self):
+        invalidate_catalog()
+        self.addCleanup(invalidate_catalog)
+        applicant = ApplicantProfile.objects.create(
+                user=get_user_model().objects.create_user(
+                        username='test@example.com',
+                        password='pass1234'
+                ),
+                must_change_password=False
+        )
+        self.application = Application.objects.create(
+                applicant=applicant,
+                due_at=datetime(2017, 4, 10, 23, 59, 59,
+                                tzinfo=timezone(timedelta(hours=-5))),
+                address='123 Main St',
+                phone='609-412-4321',
+                psu_email='abc123@psu.edu',
+                psu_id='912345678',
+                major='Engineering Science',
+                semester_initiated=Semester('FA15'),
+                semester_graduating=Semester('SP19'),
+                cumulative_gpa=3.5,
+                semester_gpa=3.5
+        )
+        self.application.award_set.add(
+                Award.objects.latest_version_of('joe_conway')
+        )
+        self.client.login(username='test@example.com', password='pass1234')
+
+    def _create_finaid(self, provider):
+        return FinancialAid.objects.create(application=self.application,
+                                           aid_type='income',
+                                           provider=provider,
+                                           installment_frequency='yearly',
+                                           installment_amount=10.0)
+
+    def _row(self, index, finaid=None, **fields):
+        data = {'form-{}-aid_type'.format(index): 'income',
+                'form-{}-provider'.format(index): '',
+                'form-{}-installment_amount'.format(index): '10',
+                'form-{}-installment_frequency'.format(index): 'yearly'}
+        if finaid is not None:
+            data['form-{}-finaid_id'.format(index)] = finaid.pk
+        for field, value in fields.items():
+            data['form-{}-{}'.format(index, field)] = value
+        return data
+
+    def test_create_update_delete(self):
+        """One POST can create, update, and delete records together"""
+
+        kept = self._create_finaid('Kept')
+        deleted = self._create_finaid('Deleted')
+        data = {'form-TOTAL_FORMS': 3,
+                'form-INITIAL_FORMS': 2,
+                'submit-type': 'delete-{}'.format(deleted.pk)}
+        data.update(self._row(0, kept, provider='Updated',
+                              installment_amount='25.50',
+                              semestertype_finished='Fall',
+                              year_finished='2018'))
+        data.update(self._row(1, deleted, provider='Deleted'))
+        data.update(self._row(2, provider='Created',
+                              aid_type='private_grant'))
+        response = self.client.post('/freemoney/finaid', data)
+        self.assertEqual(302, response.status_code)
+
+        finaids = list(self.application.financialaid_set.order_by('pk'))
+        self.assertEqual(2, len(finaids))
+        self.assertEqual(kept.pk, finaids[0].pk)
+        self.assertEqual('Updated', finaids[0].provider)
+        self.assertEqual(25.5, finaids[0].installment_amount)
+        self.assertEqual(Semester('FA18'), finaids[0].semester_finished)
+        self.assertEqual('Created', finaids[1].provider)
+        self.assertEqual('private_grant', finaids[1].aid_type)
+
+    def test_unchanged(self):
+        """Records which are not changed are not updated"""
+
+        kept = self._create_finaid('Kept')
+        data = {'form-TOTAL_FORMS': 2,
+                'form-INITIAL_FORMS': 1,
+                'submit-type': 'save'}
+        data.update(self._row(0, kept, provider='Kept'))
+        data.update(self._row(1, aid_type='', installment_amount='',
+                              installment_frequency=''))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post('/freemoney/finaid', data)
+        self.assertFalse(any('freemoney_financialaid' in query['sql'] and
+                             not query['sql'].startswith('SELECT')
+                             for query in queries.captured_queries))
+        self.assertEqual(['Kept'],
+                         [finaid.provider for finaid
+                          in self.application.financialaid_set.all()])
+
+    def test_delete_query_count(self):
+        """Deleting many records costs no more queries than deleting a few"""
+
+        kept = self._create_finaid('Kept')
+        data = {'form-TOTAL_FORMS': 1,
+                'form-INITIAL_FORMS': 1,
+                'submit-type': 'save'}
+        data.update(self._row(0, kept, provider='Kept'))
+        self.client.post('/freemoney/finaid', data)
+
+        for count in [2, 20]:
+            for index in range(count):
+                self._create_finaid('Deleted {}'.format(index))
+            if count == 2:
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.post('/freemoney/finaid', data)
+            else:
+                with self.assertNumQueries(len(queries)):
+                    self.client.post('/freemoney/finaid', data)
+            self.assertEqual([kept],
+                             list(self.application.financialaid_set.all()))
+
+    def test_unknown_record(self):
+        """A record of another Application cannot be changed"""
+
+        other = Application.objects.create(
+                applicant=self.application.applicant,
+                due_at=datetime(2016, 11, 15, tzinfo=timezone.utc)
+        )
+        foreign = FinancialAid.objects.create(application=other,
+                                              provider='Foreign')
+        data = {'form-TOTAL_FORMS': 1,
+                'form-INITIAL_FORMS': 1,
+                'submit-type': 'save'}
+        data.update(self._row(0, foreign, provider='Changed'))
+        with self.assertRaises(KeyError):
+            self.client.post('/freemoney/finaid', data)
+        foreign.refresh_from_db()
+        self.assertEqual('Foreign', foreign.provider)
+
+    def test_table_rendering(self):
+        """The table is rendered just as it was before it had a template"""
+
+        complete = self._create_finaid('Complete')
+        incomplete = FinancialAid.objects.create(application=self.application,
+                                                 aid_type='private_loan')
+        data = {'form-TOTAL_FORMS': 3,
+                'form-INITIAL_FORMS': 2,
+                'submit-type': 'next'}
+        data.update(self._row(0, complete, provider='Complete',
+                              semestertype_finished='Fall',
+                              year_finished='2018'))
+        data.update(self._row(1, incomplete, aid_type='private_loan',
+                              installment_amount='',
+                              installment_frequency=''))
+        data.update(self._row(2, aid_type='', installment_amount='',
+                              installment_frequency=''))
+        self.assertRedirects(self.client.post('/freemoney/finaid', data),
+                             '/freemoney/finaid',
+                             fetch_redirect_response=False)
+
+        # (with errors, from the failed attempt to go to the next page)
+        the_table = self.client.get('/freemoney/finaid').context['the_table']
+        the_table = re.sub(r'>\s+<', '><', the_table.strip())
+        for placeholder, finaid in [('COMPLETE_PK', complete),
+                                    ('INCOMPLETE_PK', incomplete)]:
+            the_table = the_table.replace('value="{}"'.format(finaid.pk),
+                                          'value="{}"'.format(placeholder))
+        expected_path = os.path.join(os.path.dirname(__file__),
+                                     'test_data', 'finaid_table.html')
+        with open(expected_path) as expected:
+            self.assertEqual(expected.read().strip(), the_table)